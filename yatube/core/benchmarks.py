@@ -0,0 +1,28 @@
+"""Замеры времени для команд bench_*."""
+import math
+import statistics
+import time
+
+
+def measure(func, samples):
+    """Время samples вызовов func в секундах."""
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def percentile(timings, share):
+    """Наименьший замер, не меньше которого доля share всех замеров."""
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, math.ceil(share * len(timings)) - 1)]
+
+
+def summary(title, timings):
+    """Строка отчёта: медиана и p95 в миллисекундах."""
+    return (
+        f'{title}: медиана {statistics.median(timings) * 1000:.2f} мс, '
+        f'p95 {percentile(timings, 0.95) * 1000:.2f} мс'
+    )
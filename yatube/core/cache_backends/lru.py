@@ -0,0 +1,184 @@
+"""Кэш в памяти процесса с бюджетом в байтах и настоящим LRU.
+
+В отличие от LocMemCache размер ограничен суммарным объёмом
+значений, а не числом записей, и вытесняются давно не читанные
+ключи. Большие значения хранятся сжатыми. Для каждого префикса
+ключа (часть до первого двоеточия) считаются попадания, промахи
+и вытеснения.
+"""
+import pickle
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict, defaultdict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_stores = {}
+
+
+class _Store:
+
+    def __init__(self):
+        self.items = OrderedDict()
+        self.lock = threading.RLock()
+        self.stats = defaultdict(Counter)
+        self.size = 0
+
+
+def key_prefix(made_key):
+    """Префикс исходного ключа: make_key() даёт '<prefix>:<version>:<key>'."""
+    return made_key.split(':', 2)[-1].split(':', 1)[0]
+
+
+class LRUCache(BaseCache):
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._compress_min = int(options.get('COMPRESS_MIN_BYTES', 1024))
+        self._compress_level = int(options.get('COMPRESS_LEVEL', 6))
+        self._state = _stores.setdefault(name, _Store())
+        self._cache = self._state.items
+        self._lock = self._state.lock
+        self._stats = self._state.stats
+
+    def _pack(self, value):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(blob) >= self._compress_min:
+            packed = zlib.compress(blob, self._compress_level)
+            if len(packed) < len(blob):
+                return packed, True
+        return blob, False
+
+    def _unpack(self, blob, compressed):
+        return pickle.loads(zlib.decompress(blob) if compressed else blob)
+
+    def _expired(self, item):
+        return item[2] is not None and item[2] <= time.time()
+
+    def _lookup(self, key):
+        item = self._cache.get(key)
+        if item is not None and self._expired(item):
+            self._remove(key)
+            item = None
+        return item
+
+    def _remove(self, key):
+        blob = self._cache.pop(key)[0]
+        self._state.size -= len(blob)
+
+    def _store(self, key, value, timeout):
+        blob, compressed = self._pack(value)
+        if key in self._cache:
+            self._remove(key)
+        if len(blob) > self._max_bytes:
+            return
+        self._cache[key] = (
+            blob, compressed, self.get_backend_timeout(timeout)
+        )
+        self._state.size += len(blob)
+        while self._state.size > self._max_bytes:
+            evicted, _ = next(iter(self._cache.items()))
+            self._remove(evicted)
+            self._stats[key_prefix(evicted)]['evictions'] += 1
+
+    def _hit(self, key, item):
+        self._cache.move_to_end(key)
+        self._stats[key_prefix(key)]['hits'] += 1
+        return self._unpack(item[0], item[1])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            if self._lookup(key) is not None:
+                return False
+            self._store(key, value, timeout)
+            return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            item = self._lookup(key)
+            if item is None:
+                self._stats[key_prefix(key)]['misses'] += 1
+                return default
+            return self._hit(key, item)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        with self._lock:
+            for key in keys:
+                made_key = self.make_key(key, version=version)
+                self.validate_key(made_key)
+                item = self._lookup(made_key)
+                if item is None:
+                    self._stats[key_prefix(made_key)]['misses'] += 1
+                else:
+                    found[key] = self._hit(made_key, item)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            self._store(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            item = self._lookup(key)
+            if item is None:
+                return False
+            self._cache[key] = (
+                item[0], item[1], self.get_backend_timeout(timeout)
+            )
+            return True
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            if key in self._cache:
+                self._remove(key)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            return self._lookup(key) is not None
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        with self._lock:
+            item = self._lookup(made_key)
+            if item is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = self._unpack(item[0], item[1]) + delta
+            blob, compressed = self._pack(value)
+            self._state.size += len(blob) - len(item[0])
+            self._cache[made_key] = (blob, compressed, item[2])
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._stats.clear()
+            self._state.size = 0
+
+    @property
+    def size(self):
+        return self._state.size
+
+    def stats(self):
+        """Счётчики hits/misses/evictions по префиксам ключей."""
+        with self._lock:
+            return {
+                prefix: dict(counter)
+                for prefix, counter in self._stats.items()
+            }
@@ -0,0 +1,56 @@
+"""Дырки в общих закэшированных страницах.
+
+Шаблон страницы собирается без данных читателя: вместо блоков,
+зависящих от пользователя, тег {% hole %} оставляет маркер.
+HoleMiddleware перед отдачей ответа заменяет маркеры на HTML,
+отрисованный для текущего запроса, поэтому одна запись кэша
+страниц подходит всем пользователям.
+"""
+import logging
+import re
+from urllib.parse import parse_qsl, urlencode
+
+from django.template.loader import render_to_string
+
+logger = logging.getLogger(__name__)
+
+HOLES = {}
+
+MARKER = re.compile(rb'<!--hole:(\w+)\?([^>]*)-->')
+
+
+def register(name):
+    """Регистрирует функцию дырки: (request, **params) -> HTML."""
+    def decorator(func):
+        HOLES[name] = func
+        return func
+    return decorator
+
+
+def register_template(name, template_name):
+    """Дырка, которая рендерит шаблон с контекстом запроса."""
+    def render(request, **params):
+        return render_to_string(template_name, params, request=request)
+    HOLES[name] = render
+    return render
+
+
+def marker(name, **params):
+    if name not in HOLES:
+        raise KeyError(f'Unknown hole: {name}')
+    return f'<!--hole:{name}?{urlencode(params)}-->'
+
+
+def fill(request, content):
+    def replace(match):
+        name = match.group(1).decode()
+        if name not in HOLES:
+            # Страница из кэша могла пережить регистрацию дырки.
+            logger.warning('Unknown hole %s in cached page', name)
+            return b''
+        params = dict(parse_qsl(match.group(2).decode()))
+        return HOLES[name](request, **params).encode()
+    return MARKER.sub(replace, content)
+
+
+register_template('header', 'includes/header.html')
@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache_backends.sqlite import SQLiteCache
+
+PAGE = 'x' * 30000
+
+
+def worker(make_cache, index, workers, keys, barrier, results):
+    cache = make_cache()
+    cache.set_many({f'page:{index}:{i}': PAGE for i in range(keys)})
+    barrier.wait()
+    names = [f'page:{w}:{i}' for w in range(workers) for i in range(keys)]
+    results.put(len(cache.get_many(names)) / len(names))
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает LocMemCache и SQLiteCache: скорость и общие попадания.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ops', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            location = os.path.join(directory, 'cache.sqlite3')
+            backends = {
+                'LocMemCache': lambda: LocMemCache(
+                    'bench', {'OPTIONS': {'MAX_ENTRIES': 10 ** 6}}
+                ),
+                'SQLiteCache': lambda: SQLiteCache(location, {}),
+            }
+            for name, make_cache in backends.items():
+                self.stdout.write(name)
+                self.bench_ops(make_cache(), options['ops'])
+                self.bench_sharing(make_cache, options['workers'])
+
+    def timed(self, title, ops, func):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'  {title}: {ops / elapsed:,.0f} оп/с')
+
+    def bench_ops(self, cache, ops):
+        keys = [f'page:{i}' for i in range(ops)]
+        self.timed('set', ops, lambda: [cache.set(key, PAGE) for key in keys])
+        self.timed('get', ops, lambda: [cache.get(key) for key in keys])
+        batches = [keys[i:i + 10] for i in range(0, ops, 10)]
+        self.timed(
+            'get_many по 10 ключей', len(batches),
+            lambda: [cache.get_many(batch) for batch in batches],
+        )
+
+    def bench_sharing(self, make_cache, workers):
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(workers)
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=worker,
+                args=(make_cache, index, workers, 100, barrier, results),
+            )
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        ratios = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        self.stdout.write(
+            f'  попадания между {workers} процессами: '
+            f'{sum(ratios) / len(ratios):.0%}'
+        )
@@ -1,5 +1,13 @@
+import os
+import shutil
+import tempfile
+import time
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.test import RequestFactory, SimpleTestCase, TestCase, Client
+from core import benchmarks, holes
+from core.cache_backends.lru import LRUCache
+from core.cache_backends.sqlite import SQLiteCache
 from posts.models import Post, Group
 
 User = get_user_model()
@@ -29,3 +37,94 @@ class Post404Tests(TestCase):
         """Страница 404 использует правильный шаблон."""
         response = self.authorized_client.get('/unknown/')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_shared_between_instances(self):
+        """Запись видна другому экземпляру с тем же файлом."""
+        self.cache.set_many({'a': 1, 'b': [2]})
+        other = SQLiteCache(self.location, {})
+        self.assertEqual(other.get_many(['a', 'b', 'c']), {'a': 1, 'b': [2]})
+
+    def test_add_is_exclusive(self):
+        """add() удаётся один раз, пока ключ не истёк."""
+        other = SQLiteCache(self.location, {})
+        self.assertTrue(self.cache.add('lock', 1, 60))
+        self.assertFalse(other.add('lock', 1, 60))
+        self.cache.set('expiring', 1, 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('expiring'))
+        self.assertTrue(other.add('expiring', 2))
+
+    def test_incr(self):
+        """incr() меняет число и падает на отсутствующем ключе."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+
+class LRUCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = LRUCache('test-lru', {'OPTIONS': {
+            'MAX_BYTES': 4096, 'COMPRESS_MIN_BYTES': 256,
+        }})
+        self.cache.clear()
+
+    def test_evicts_least_recently_used(self):
+        """При превышении бюджета вытесняется давно не читанный ключ."""
+        self.cache.set('a:1', os.urandom(1500))
+        self.cache.set('a:2', os.urandom(1500))
+        self.cache.get('a:1')
+        self.cache.set('b:3', os.urandom(1500))
+        self.assertTrue(self.cache.has_key('a:1'))
+        self.assertFalse(self.cache.has_key('a:2'))
+        self.assertLessEqual(self.cache.size, 4096)
+        self.assertEqual(self.cache.stats()['a']['evictions'], 1)
+
+    def test_compresses_large_values(self):
+        """Большие значения хранятся сжатыми и читаются как были."""
+        page = '<div>пост</div>' * 1000
+        self.cache.set('page:index', page)
+        self.assertEqual(self.cache.get('page:index'), page)
+        self.assertLess(self.cache.size, len(page))
+
+    def test_stats_by_prefix(self):
+        """Попадания и промахи считаются по префиксу ключа."""
+        self.cache.set('card:1', 'x')
+        self.cache.get_many(['card:1', 'card:2'])
+        self.cache.get('page:1')
+        stats = self.cache.stats()
+        self.assertEqual(stats['card'], {'hits': 1, 'misses': 1})
+        self.assertEqual(stats['page'], {'misses': 1})
+
+
+class HolesTests(SimpleTestCase):
+
+    def test_unknown_hole_is_dropped(self):
+        """Маркер незарегистрированной дырки заменяется пустой строкой."""
+        content = b'<p>a</p><!--hole:gone?x=1--><p>b</p>'
+        request = RequestFactory().get('/')
+        with self.assertLogs('core.holes', 'WARNING'):
+            self.assertEqual(
+                holes.fill(request, content), b'<p>a</p><p>b</p>'
+            )
+
+
+class BenchmarksTests(SimpleTestCase):
+
+    def test_percentile_rounds_rank_up(self):
+        """p95 берётся по рангу ceil(0.95 * n) и не выходит за выборку."""
+        self.assertEqual(benchmarks.percentile(range(1, 21), 0.95), 19)
+        self.assertEqual(benchmarks.percentile(range(1, 11), 0.95), 10)
+        self.assertEqual(benchmarks.percentile([5], 0.95), 5)
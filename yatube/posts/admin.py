@@ -1,14 +1,35 @@
 from django.contrib import admin
 
 from .models import Group, Post, Comment, Follow
+from .paginators import CachedCountPaginator
+from .search import match_expression, matching_ids, supported
 
 
-class PostAdmin(admin.ModelAdmin):
+class FullTextSearchMixin:
+    """Поиск changelist по индексу FTS5 вместо LIKE по search_fields.
+
+    search_fields остаются для других баз и запросов без слов.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        expression = match_expression(search_term)
+        if not expression or not supported():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(
+            pk__in=matching_ids(self.model, expression)
+        ), False
+
+
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_editable = ('group',)
     empty_value_display = '-пусто-'
+    paginator = CachedCountPaginator
+    show_full_result_count = False
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -17,10 +38,12 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('post', 'author', 'text', 'created')
     list_filter = ('created',)
     search_fields = ('text',)
+    paginator = CachedCountPaginator
+    show_full_result_count = False
 
 
 class FollowAdmin(admin.ModelAdmin):
@@ -0,0 +1,309 @@
+"""JSON API лент только для чтения.
+
+Строки выбираются проекциями .values() без создания моделей,
+страницы листаются курсорами CursorPaginator, а ?fields= оставляет
+в ответе только нужные клиенту поля. Ответы кодируются orjson
+из requirements.txt; без него работает стандартный json.
+"""
+import json
+from functools import wraps
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+
+from . import cache
+from .models import Comment, Group, Post, TimelineEntry, User
+from .paginators import MAX_INTEGER, CursorPaginator, TimelinePaginator
+from .timeline import pulled_feeds
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+POSTS_PER_PAGE = 10
+
+BATCH_LIMIT = 200
+
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'excerpt': 'excerpt',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+    'image_preview': 'image_preview',
+}
+
+COMMENT_FIELDS = {
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+
+USER_FIELDS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'posts_count',
+}
+
+GROUP_FIELDS = {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+    'posts_count': 'posts_count',
+}
+
+
+class InvalidFields(Exception):
+    pass
+
+
+class InvalidBatch(Exception):
+    pass
+
+
+def dumps(data):
+    """JSON в байтах; даты в обоих путях форматирует DjangoJSONEncoder."""
+    if orjson is not None:
+        return orjson.dumps(
+            data, default=DjangoJSONEncoder().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False).encode()
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        dumps(data), content_type='application/json', status=status
+    )
+
+
+def api_view(view):
+    """Ошибки API отдаются в JSON, а не страницами сайта."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except InvalidFields as error:
+            return json_response(
+                {'error': f'Unknown fields: {", ".join(error.args[0])}'}, 400
+            )
+        except InvalidBatch as error:
+            return json_response({'error': str(error)}, 400)
+        except Http404:
+            return json_response({'error': 'Not found'}, 404)
+    return wrapper
+
+
+def requested_fields(request, allowed):
+    """Поля из ?fields=a,b в порядке запроса, по умолчанию все."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(allowed)
+    fields = list(dict.fromkeys(
+        field.strip() for field in raw.split(',') if field.strip()
+    ))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise InvalidFields(unknown)
+    return fields
+
+
+def post_lookups(fields):
+    """Колонки проекции: ключ курсора выбирается всегда."""
+    return list(dict.fromkeys(
+        ['pk', 'pub_date']
+        + [POST_FIELDS[field] for field in fields if field in POST_FIELDS]
+    ))
+
+
+def serialize(row, fields, mapping):
+    data = {field: row[mapping[field]] for field in fields if field in mapping}
+    if 'image' in data:
+        data['image'] = (
+            default_storage.url(data['image']) if data['image'] else None
+        )
+    return data
+
+
+def feed_response(request, paginator, fields):
+    page = paginator.get_request_page(request)
+    return json_response({
+        'results': [
+            serialize(row, fields, POST_FIELDS) for row in page.object_list
+        ],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@cache.conditional_page(cache.index_scopes, cache.index_newest)
+@cache.cached_page(cache.index_scopes)
+@api_view
+def index(request):
+    fields = requested_fields(request, POST_FIELDS)
+    posts = Post.objects.values(*post_lookups(fields))
+    return feed_response(
+        request, CursorPaginator(posts, POSTS_PER_PAGE), fields
+    )
+
+
+@cache.conditional_page(cache.group_scopes, cache.group_newest)
+@cache.cached_page(cache.group_scopes)
+@api_view
+def group_posts(request, slug):
+    fields = requested_fields(request, POST_FIELDS)
+    group = get_object_or_404(Group, slug=slug)
+    posts = group.posts.values(*post_lookups(fields))
+    return feed_response(
+        request, CursorPaginator(posts, POSTS_PER_PAGE), fields
+    )
+
+
+@cache.conditional_page(cache.profile_scopes, cache.profile_newest)
+@cache.cached_page(cache.profile_scopes)
+@api_view
+def profile(request, username):
+    fields = requested_fields(request, POST_FIELDS)
+    author = get_object_or_404(User, username=username)
+    posts = author.posts.values(*post_lookups(fields))
+    return feed_response(
+        request, CursorPaginator(posts, POSTS_PER_PAGE), fields
+    )
+
+
+@api_view
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return json_response({'error': 'Authentication required'}, 401)
+    fields = requested_fields(request, POST_FIELDS)
+    lookups = post_lookups(fields)
+    entries = TimelineEntry.objects.filter(user=request.user).values(
+        *[f'post__{lookup}' for lookup in lookups]
+    )
+    pulled = [
+        posts.values(*lookups) for posts in pulled_feeds(request.user)
+    ]
+    return feed_response(
+        request,
+        TimelinePaginator(entries, POSTS_PER_PAGE, pulled=pulled),
+        fields,
+    )
+
+
+@cache.conditional_page(cache.detail_scopes, cache.detail_newest)
+@api_view
+def post_detail(request, post_id):
+    fields = requested_fields(request, [*POST_FIELDS, 'comments'])
+    post = get_object_or_404(
+        Post.objects.values(*post_lookups(fields)), pk=post_id
+    )
+    data = serialize(post, fields, POST_FIELDS)
+    if 'comments' in fields:
+        comments = Comment.objects.filter(post_id=post_id).values(
+            *COMMENT_FIELDS.values()
+        )
+        data['comments'] = [
+            serialize(comment, COMMENT_FIELDS, COMMENT_FIELDS)
+            for comment in comments
+        ]
+    return json_response(data)
+
+
+def batch_keys(request, param, convert=str):
+    """Ключи из ?<param>=a,b без повторов, в порядке запроса."""
+    try:
+        keys = list(dict.fromkeys(
+            convert(key.strip())
+            for key in request.GET.get(param, '').split(',') if key.strip()
+        ))
+    except ValueError:
+        raise InvalidBatch(f'Invalid {param}')
+    if not keys:
+        raise InvalidBatch(f'Missing {param}')
+    if len(keys) > BATCH_LIMIT:
+        raise InvalidBatch(f'At most {BATCH_LIMIT} {param} per request')
+    return keys
+
+
+def batch_id(key):
+    """id поста из пакета; вне целых SQLite запрос не дойдёт до базы."""
+    pk = int(key)
+    if not -MAX_INTEGER <= pk <= MAX_INTEGER:
+        raise ValueError(key)
+    return pk
+
+
+def batch_response(keys, rows, fields, mapping):
+    """Найденные строки в порядке запроса и список ненайденных ключей."""
+    return json_response({
+        'results': [
+            serialize(rows[key], fields, mapping)
+            for key in keys if key in rows
+        ],
+        'missing': [key for key in keys if key not in rows],
+    })
+
+
+@api_view
+def posts_batch(request):
+    """Посты по ?ids= за два запроса: сами посты и число постов авторов."""
+    ids = batch_keys(request, 'ids', batch_id)
+    fields = requested_fields(
+        request, [*POST_FIELDS, 'author_posts_count']
+    )
+    lookups = post_lookups(fields) + ['author_id']
+    rows = {
+        row['pk']: row
+        for row in Post.objects.filter(pk__in=ids).values(*lookups)
+    }
+    if 'author_posts_count' in fields:
+        counts = dict(
+            Post.objects.filter(
+                author_id__in={row['author_id'] for row in rows.values()}
+            ).values('author_id').annotate(
+                count=Count('pk')
+            ).order_by().values_list('author_id', 'count')
+        )
+        for row in rows.values():
+            row['author_posts_count'] = counts[row['author_id']]
+    return batch_response(
+        ids, rows, fields,
+        {**POST_FIELDS, 'author_posts_count': 'author_posts_count'},
+    )
+
+
+@api_view
+def users_batch(request):
+    usernames = batch_keys(request, 'usernames')
+    fields = requested_fields(request, USER_FIELDS)
+    users = User.objects.filter(username__in=usernames)
+    if 'posts_count' in fields:
+        users = users.annotate(posts_count=Count('posts'))
+    lookups = dict.fromkeys(
+        ['username'] + [USER_FIELDS[field] for field in fields]
+    )
+    rows = {row['username']: row for row in users.values(*lookups)}
+    return batch_response(usernames, rows, fields, USER_FIELDS)
+
+
+@api_view
+def groups_batch(request):
+    slugs = batch_keys(request, 'slugs')
+    fields = requested_fields(request, GROUP_FIELDS)
+    groups = Group.objects.filter(slug__in=slugs)
+    if 'posts_count' in fields:
+        groups = groups.annotate(posts_count=Count('posts'))
+    lookups = dict.fromkeys(
+        ['slug'] + [GROUP_FIELDS[field] for field in fields]
+    )
+    rows = {row['slug']: row for row in groups.values(*lookups)}
+    return batch_response(slugs, rows, fields, GROUP_FIELDS)
@@ -0,0 +1,285 @@
+import datetime
+import hashlib
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .models import Post
+
+
+def generation_key(scope):
+    return f'generation:{scope}'
+
+
+def get_generations(scopes):
+    """Текущие поколения областей кэша.
+
+    Поколение — момент последнего изменения в наносекундах, поэтому
+    после потери ключа новое значение не совпадёт ни с одним старым.
+    """
+    keys = [generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    now = time.time_ns()
+    cache.set_many(
+        {generation_key(scope): now for scope in scopes if scope}, None
+    )
+
+
+def request_generations(request, scopes):
+    memo = request.__dict__.setdefault('_generations', {})
+    if scopes not in memo:
+        memo[scopes] = get_generations(scopes)
+    return memo[scopes]
+
+
+def page_key(request, scopes):
+    generations = request_generations(request, scopes)
+    raw = '|'.join(
+        [request.get_full_path()]
+        + [f'{scope}={generation}'
+           for scope, generation in zip(scopes, generations)]
+    )
+    return f'page:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+METRICS = ('hit', 'stale', 'miss', 'rebuild', 'coalesced')
+
+# Счётчики копятся в памяти процесса и переносятся в общий кэш не чаще
+# раза в POSTS_PAGE_CACHE_METRICS_FLUSH секунд: запись в SQLiteCache
+# берёт общую блокировку базы, а попадание должно оставаться дешёвым.
+pending_metrics = Counter()
+metrics_flushed_at = time.monotonic()
+metrics_lock = threading.Lock()
+
+
+def record(metric):
+    with metrics_lock:
+        pending_metrics[metric] += 1
+        due = (
+            time.monotonic() - metrics_flushed_at
+            >= settings.POSTS_PAGE_CACHE_METRICS_FLUSH
+        )
+    if due:
+        flush_metrics()
+
+
+def flush_metrics():
+    """Переносит накопленные в процессе счётчики в общий кэш."""
+    global pending_metrics, metrics_flushed_at
+    with metrics_lock:
+        counts, pending_metrics = pending_metrics, Counter()
+        metrics_flushed_at = time.monotonic()
+    for metric, count in counts.items():
+        key = f'metrics:page_cache:{metric}'
+        if not cache.add(key, count, None):
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                cache.add(key, count, None)
+
+
+def page_cache_stats():
+    flush_metrics()
+    keys = {f'metrics:page_cache:{metric}': metric for metric in METRICS}
+    found = cache.get_many(keys)
+    return {metric: found.get(key, 0) for key, metric in keys.items()}
+
+
+def acquire(key):
+    """Межпроцессная блокировка: cache.add атомарен в общем кэше."""
+    return cache.add(f'{key}:lock', 1, settings.POSTS_PAGE_CACHE_LOCK_TIMEOUT)
+
+
+def release(key):
+    cache.delete(f'{key}:lock')
+
+
+def wait_for(key):
+    deadline = time.monotonic() + settings.POSTS_PAGE_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def render_page(view, request, args, kwargs, key, timeout):
+    response = view(request, *args, **kwargs)
+    if response.status_code == 200 and not response.streaming:
+        cache.set(
+            key,
+            (response.content, response['Content-Type'],
+             time.time() + timeout),
+            timeout + settings.POSTS_PAGE_CACHE_STALE_TIMEOUT,
+        )
+    return response
+
+
+def cached_page(scopes, timeout=None):
+    """Кэширует страницу под ключом из поколений её областей.
+
+    scopes(request, **kwargs) возвращает имена областей; любое
+    изменение в области меняет ключ, поэтому TTL может быть долгим.
+    После истечения TTL запись ещё POSTS_PAGE_CACHE_STALE_TIMEOUT
+    отдаётся как устаревшая, пока один запрос под блокировкой
+    пересобирает страницу; остальные промахи ждут его результата.
+    Читатель в ключ не входит: в кэш попадает общая для всех оболочка
+    с дырками, которые HoleMiddleware заполняет для каждого запроса.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            page_timeout = (
+                settings.POSTS_PAGE_CACHE_TIMEOUT
+                if timeout is None else timeout
+            )
+            key = page_key(request, scopes(request, *args, **kwargs))
+            entry = cache.get(key)
+            if entry is not None and entry[2] > time.time():
+                record('hit')
+                return HttpResponse(entry[0], content_type=entry[1])
+            if acquire(key):
+                record('miss' if entry is None else 'rebuild')
+                try:
+                    return render_page(
+                        view, request, args, kwargs, key, page_timeout
+                    )
+                finally:
+                    release(key)
+            if entry is not None:
+                record('stale')
+            else:
+                entry = wait_for(key)
+            if entry is None:
+                record('miss')
+                return render_page(
+                    view, request, args, kwargs, key, page_timeout
+                )
+            record('coalesced')
+            return HttpResponse(entry[0], content_type=entry[1])
+        return wrapper
+    return decorator
+
+
+def conditional_page(scopes, newest):
+    """Conditional GET по поколениям областей страницы.
+
+    ETag строится из поколений и читателя, Last-Modified — из pub_date
+    самого свежего поста, который возвращает newest(request, **kwargs),
+    и времени последнего изменения областей. 304 отдаётся до кэша
+    страниц и до view.
+    """
+    def etag(request, *args, **kwargs):
+        generations = request_generations(
+            request, scopes(request, *args, **kwargs)
+        )
+        raw = '|'.join(map(str, [request.user.pk, *generations]))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        generations = request_generations(
+            request, scopes(request, *args, **kwargs)
+        )
+        changed = datetime.datetime.fromtimestamp(
+            max(generations) / 10 ** 9, tz=timezone.utc
+        )
+        newest_date = newest(request, *args, **kwargs)
+        return max(changed, newest_date) if newest_date else changed
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def index_scopes(request):
+    return ('posts', 'groups', 'users')
+
+
+def group_scopes(request, slug):
+    return (f'group:{slug}', 'groups', 'users')
+
+
+def profile_scopes(request, username):
+    return (f'author:{username}', 'groups', 'users')
+
+
+def detail_scopes(request, post_id):
+    """Пост и его автор: страница показывает число постов автора."""
+    username, _ = detail_post(request, post_id)
+    if username is None:
+        return (f'post:{post_id}', 'groups', 'users')
+    return (f'post:{post_id}', f'author:{username}', 'groups', 'users')
+
+
+def newest_pub_date(posts):
+    return posts.aggregate(newest=Max('pub_date'))['newest']
+
+
+def index_newest(request):
+    return newest_pub_date(Post.objects.all())
+
+
+def group_newest(request, slug):
+    return newest_pub_date(Post.objects.filter(group__slug=slug))
+
+
+def profile_newest(request, username):
+    return newest_pub_date(Post.objects.filter(author__username=username))
+
+
+def detail_newest(request, post_id):
+    return detail_post(request, post_id)[1]
+
+
+def detail_post(request, post_id):
+    """Имя автора и pub_date поста одним запросом на весь запрос.
+
+    Для несуществующего поста — (None, None).
+    """
+    memo = request.__dict__.setdefault('_detail_posts', {})
+    if post_id not in memo:
+        memo[post_id] = Post.objects.filter(pk=post_id).values_list(
+            'author__username', 'pub_date'
+        ).first() or (None, None)
+    return memo[post_id]
+
+
+def post_scopes(post, old_group_slug=None):
+    return (
+        'posts',
+        f'post:{post.pk}',
+        f'author:{post.author.username}',
+        f'group:{post.group.slug}' if post.group_id else None,
+        f'group:{old_group_slug}' if old_group_slug else None,
+    )
+
+
+def queryset_scopes(posts):
+    """Области кэша всех постов выборки, собранные одним запросом."""
+    scopes = {'posts'}
+    for pk, username, slug in posts.values_list(
+        'pk', 'author__username', 'group__slug'
+    ):
+        scopes.update((
+            f'post:{pk}',
+            f'author:{username}',
+            f'group:{slug}' if slug else None,
+        ))
+    return scopes
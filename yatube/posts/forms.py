@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from .models import Post, Comment
+from .uploads import normalize
 
 
 class PostForm(forms.ModelForm):
@@ -18,6 +20,24 @@ class PostForm(forms.ModelForm):
             raise forms.ValidationError('Введите текст поста')
         return data
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return normalize(image)
+        return image
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # Файл, отклонённый ImageUploadHandler, приходит пустым: вместо
+        # общей ошибки поля показываем причину отказа.
+        upload_error = getattr(
+            self.files.get('image'), 'upload_error', None
+        )
+        if upload_error:
+            self.errors.pop('image', None)
+            self.add_error('image', upload_error)
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
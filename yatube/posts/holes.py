@@ -0,0 +1,18 @@
+from django.template.loader import render_to_string
+
+from core import holes
+
+from .models import Follow
+
+holes.register_template('switcher', 'posts/includes/switcher.html')
+
+
+@holes.register('follow_button')
+def follow_button(request, author):
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author__username=author
+    ).exists()
+    return render_to_string(
+        'posts/includes/follow_button.html',
+        {'author': author, 'following': following},
+    )
@@ -0,0 +1,71 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.utils import timezone
+
+from posts import cache
+from posts.models import Post
+from posts.uploads import describe
+
+
+def describe_stored(name):
+    storage = Post._meta.get_field('image').storage
+    with storage.open(name) as file:
+        return describe(file)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры и превью картинок старых постов пачками '
+        'в пуле процессов. Каждый файл читается один раз, даже если '
+        'на него ссылаются несколько постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            image_width__isnull=True
+        ).order_by('pk')
+        # Дочерние процессы не должны делить соединения родителя.
+        connections.close_all()
+        done = failed = 0
+        last_pk = 0
+        with ProcessPoolExecutor(
+            options['workers'], initializer=connections.close_all
+        ) as pool:
+            while True:
+                batch = list(posts.filter(pk__gt=last_pk).values_list(
+                    'pk', 'image'
+                )[:options['batch_size']])
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+                names = sorted({name for _, name in batch})
+                futures = {
+                    name: pool.submit(describe_stored, name) for name in names
+                }
+                with transaction.atomic():
+                    scopes = set()
+                    for name, future in futures.items():
+                        if future.exception() is not None:
+                            failed += 1
+                            self.stderr.write(f'{name}: {future.exception()}')
+                            continue
+                        width, height, preview = future.result()
+                        affected = posts.filter(image=name)
+                        scopes |= cache.queryset_scopes(affected)
+                        affected.update(
+                            image_width=width,
+                            image_height=height,
+                            image_preview=preview,
+                            edited=timezone.now(),
+                        )
+                        done += 1
+                cache.bump(*scopes)
+                self.stdout.write(f'Обработано файлов: {done + failed}')
+        self.stdout.write(f'Готово: {done}, с ошибками: {failed}')
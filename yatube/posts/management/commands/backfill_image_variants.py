@@ -0,0 +1,79 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+PAGE_SIZE = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует миниатюры и адаптивные варианты картинок постов '
+        'пачками в пуле процессов и показывает вес картинок страницы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').order_by('pk').values_list(
+            'pk', flat=True
+        )
+        # Дочерние процессы не должны делить соединения родителя.
+        connections.close_all()
+        done = failed = 0
+        last_pk = 0
+        with ProcessPoolExecutor(
+            options['workers'], initializer=connections.close_all
+        ) as pool:
+            while True:
+                batch = list(
+                    posts.filter(pk__gt=last_pk)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                futures = {
+                    pool.submit(thumbnails.generate, pk): pk for pk in batch
+                }
+                for future in as_completed(futures):
+                    if future.exception() is None:
+                        done += 1
+                    else:
+                        failed += 1
+                        self.stderr.write(
+                            f'Пост {futures[future]}: {future.exception()}'
+                        )
+                last_pk = batch[-1]
+                self.stdout.write(f'Обработано постов: {done + failed}')
+        self.stdout.write(f'Готово: {done}, с ошибками: {failed}')
+        self.report_weight()
+
+    def report_weight(self):
+        """Вес картинок первой страницы ленты по вариантам."""
+        posts = Post.objects.exclude(image='')[:PAGE_SIZE]
+        weights = {}
+        for post in posts:
+            files = {
+                file.name: (image_format, width)
+                for image_format, width, file in [
+                    ('JPEG', thumbnails.WIDTH,
+                     thumbnails.thumbnail_file(post.image)),
+                    *thumbnails.variant_files(post.image),
+                ]
+            }
+            for name, (image_format, width) in files.items():
+                if default_storage.exists(name):
+                    weights[image_format, width] = weights.get(
+                        (image_format, width), 0
+                    ) + default_storage.size(name)
+        for (image_format, width), size in sorted(weights.items()):
+            self.stdout.write(
+                f'Первая страница, {width}px {image_format}: '
+                f'{size / 1024:.1f} КБ'
+            )
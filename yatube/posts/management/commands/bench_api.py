@@ -0,0 +1,80 @@
+import inspect
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.urls import reverse
+
+from core import benchmarks
+from posts import api, views
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает JSON API лент с рендерингом HTML тех же страниц '
+        'без кэша страниц. Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--samples', type=int, default=200)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        author = User.objects.create(username='bench-api')
+        group = Group.objects.create(
+            title='bench-api', slug='bench-api', description='bench-api'
+        )
+        posts = [
+            Post(author=author, group=group, text=f'Пост {i} ' * 20)
+            for i in range(options['posts'])
+        ]
+        for post in posts:
+            post.prepare_text()
+        Post.objects.bulk_create(posts)
+        pages = (
+            ('index', 'posts:index_page', 'posts:api_index', {}),
+            ('group_posts', 'posts:group_list', 'posts:api_group_list',
+             {'slug': group.slug}),
+            ('profile', 'posts:profile', 'posts:api_profile',
+             {'username': author.username}),
+        )
+        factory = RequestFactory()
+        for name, html_url, api_url, kwargs in pages:
+            for title, module, url, params in (
+                ('HTML', views, html_url, {}),
+                ('JSON', api, api_url, {}),
+                ('JSON ?fields=id,text', api, api_url, {'fields': 'id,text'}),
+            ):
+                # Вызов без декораторов: сравнивается сборка страницы,
+                # а не чтение из кэша страниц.
+                view = inspect.unwrap(getattr(module, name))
+                path = reverse(url, kwargs=kwargs)
+                timings = []
+                for _ in range(options['samples']):
+                    request = factory.get(path, params)
+                    request.user = AnonymousUser()
+                    start = time.perf_counter()
+                    view(request, **kwargs)
+                    timings.append(time.perf_counter() - start)
+                self.report(f'{name}, {title}', timings)
+
+    def report(self, title, timings):
+        self.stdout.write(benchmarks.summary(title, timings))
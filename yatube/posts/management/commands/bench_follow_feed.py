@@ -0,0 +1,94 @@
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core import benchmarks
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет /follow/ и создание поста на степенном графе подписок. '
+        'Все данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Среднее число подписок читателя.')
+        parser.add_argument('--posts', type=int, default=5,
+                            help='Постов у каждого автора до замера.')
+        parser.add_argument('--threshold', type=int,
+                            default=settings.TIMELINE_PUSH_FOLLOWER_LIMIT)
+        parser.add_argument('--samples', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with override_settings(
+            TIMELINE_PUSH_FOLLOWER_LIMIT=options['threshold'],
+            ALLOWED_HOSTS=['testserver'],
+        ):
+            try:
+                with transaction.atomic():
+                    self.run(options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, options):
+        rnd = random.Random(options['seed'])
+        User.objects.bulk_create(
+            User(username=f'bench-{i}') for i in range(options['users'])
+        )
+        users = list(User.objects.filter(username__startswith='bench-'))
+        # Популярность авторов распределена по Ципфу: несколько авторов
+        # собирают большую часть подписок.
+        weights = [1 / (rank + 1) for rank in range(len(users))]
+        for user in users:
+            authors = set(rnd.choices(users, weights, k=options['follows']))
+            for author in authors - {user}:
+                Follow.objects.create(user=user, author=author)
+        for author in users:
+            for i in range(options['posts']):
+                Post.objects.create(author=author, text=f'Пост {i}')
+
+        followers = {
+            user.pk: user.following.count() for user in users
+        }
+        popular = max(users, key=lambda user: followers[user.pk])
+        tail = min(users, key=lambda user: followers[user.pk])
+        for title, author in (('популярный', popular), ('обычный', tail)):
+            timings = []
+            for i in range(options['samples']):
+                start = time.perf_counter()
+                Post.objects.create(author=author, text=f'Замер {i}')
+                timings.append(time.perf_counter() - start)
+            self.report(
+                f'post_create, {title} автор '
+                f'({followers[author.pk]} подписчиков)', timings
+            )
+
+        client = Client()
+        readers = rnd.sample(users, min(options['samples'], len(users)))
+        timings = []
+        for reader in readers:
+            client.force_login(reader)
+            start = time.perf_counter()
+            client.get(reverse('posts:follow_index'))
+            timings.append(time.perf_counter() - start)
+        self.report('follow_index', timings)
+
+    def report(self, title, timings):
+        self.stdout.write(benchmarks.summary(title, timings))
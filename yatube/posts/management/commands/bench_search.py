@@ -0,0 +1,119 @@
+import itertools
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import benchmarks
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+SYLLABLES = (
+    'ка', 'ло', 'ми', 'ра', 'то', 'ве', 'су', 'ны', 'де', 'жи',
+    'по', 'ре', 'ша', 'ку', 'зо', 'ле', 'ти', 'ба', 'го', 'мы',
+)
+
+WORDS_PER_POST = 30
+
+CHUNK_SIZE = 10000
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск по индексу FTS5 с icontains на синтетических '
+        'постах: первую страницу выдачи и подсчёт совпадений, как в '
+        'админке. Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--vocabulary', type=int, default=20000)
+        parser.add_argument('--samples', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if not search.supported():
+            raise CommandError('Индекс FTS5 есть только на SQLite.')
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rng = random.Random(0)
+        words = sorted({
+            ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+            for _ in range(options['vocabulary'])
+        })
+        rng.shuffle(words)
+        # Частоты слов по закону Ципфа, как в живом тексте.
+        cum_weights = list(itertools.accumulate(
+            1 / rank for rank in range(1, len(words) + 1)
+        ))
+        author = User.objects.create(username='bench-search')
+        start = time.perf_counter()
+        for offset in range(0, options['posts'], CHUNK_SIZE):
+            size = min(CHUNK_SIZE, options['posts'] - offset)
+            Post.objects.bulk_create([
+                Post(author=author, text=' '.join(
+                    rng.choices(
+                        words, cum_weights=cum_weights, k=WORDS_PER_POST
+                    )
+                ))
+                for _ in range(size)
+            ])
+        self.stdout.write(
+            f'Создано постов: {options["posts"]} '
+            f'за {time.perf_counter() - start:.1f} с'
+        )
+        queries = (
+            ('частое слово', words[0]),
+            ('среднее слово', words[len(words) // 20]),
+            ('редкое слово', words[-1]),
+        )
+        posts = Post.objects.order_by('-pub_date', '-id')
+        for title, word in queries:
+            expression = search.match_expression(word)
+            self.measure(
+                f'{title}, icontains, страница',
+                lambda: list(posts.filter(text__icontains=word)[:10]),
+                options['samples'],
+            )
+            self.measure(
+                f'{title}, FTS5, страница',
+                lambda: list(Post.objects.in_bulk([
+                    pk for _, pk in search.ranked(
+                        Post, expression, 10, floor=search.window_floor(
+                            Post, expression, settings.SEARCH_RANK_WINDOW
+                        )
+                    )
+                ])),
+                options['samples'],
+            )
+            self.measure(
+                f'{title}, icontains, подсчёт',
+                lambda: Post.objects.filter(text__icontains=word).count(),
+                options['samples'],
+            )
+            self.measure(
+                f'{title}, FTS5, подсчёт',
+                lambda: Post.objects.filter(
+                    pk__in=search.matching_ids(Post, expression)
+                ).count(),
+                options['samples'],
+            )
+
+    def measure(self, title, query, samples):
+        self.stdout.write(
+            benchmarks.summary(title, benchmarks.measure(query, samples))
+        )
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def fingerprint(name):
+    """Восемь байт вместо имени: множество ссылок остаётся компактным.
+
+    Совпадение отпечатков лишь оставит лишний файл, но не удалит нужный.
+    """
+    return hashlib.blake2b(name.encode(), digest_size=8).digest()
+
+
+def walk(root, directory):
+    """Файлы каталога и подкаталогов: (имя относительно root, stat)."""
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk(root, entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                name = os.path.relpath(entry.path, root)
+                yield name.replace(os.sep, '/'), entry.stat()
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов и миниатюры sorl-thumbnail, на которые '
+        'не ссылается ни один пост. Каталоги обходятся потоково, ссылки '
+        'хранятся отпечатками, файлы удаляются пачками. С --dry-run '
+        'только показывает отчёт.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help='Не трогать файлы моложе стольких часов.',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.image_storage = Post._meta.get_field('image').storage
+        referenced = self.referenced()
+        cutoff = time.time() - options['min_age'] * 3600
+        roots = (
+            (self.image_storage,
+             Post._meta.get_field('image').upload_to, 'image'),
+            (default.storage, sorl_settings.THUMBNAIL_PREFIX, 'thumbnail'),
+        )
+        for storage, prefix, kind in roots:
+            count = size = 0
+            batch = []
+            for name, stat in walk(
+                storage.location, storage.path(prefix)
+            ):
+                if stat.st_mtime > cutoff or fingerprint(name) in referenced:
+                    continue
+                count += 1
+                size += stat.st_size
+                if options['verbosity'] > 1:
+                    self.stdout.write(name)
+                batch.append(name)
+                if len(batch) >= options['batch_size']:
+                    self.collect(storage, batch, kind)
+                    batch = []
+            self.collect(storage, batch, kind)
+            action = 'найдено' if self.dry_run else 'удалено'
+            self.stdout.write(
+                f'{prefix}: {action} {count} файлов, '
+                f'{size / 1024 / 1024:.1f} МБ'
+            )
+
+    def referenced(self):
+        """Отпечатки картинок постов и всех их миниатюр."""
+        referenced = set()
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).iterator()
+        for name in names:
+            key = fingerprint(name)
+            if key in referenced:
+                continue
+            referenced.add(key)
+            image = ImageFile(name, self.image_storage)
+            referenced.add(fingerprint(thumbnails.thumbnail_file(image).name))
+            referenced.update(
+                fingerprint(file.name)
+                for _, _, file in thumbnails.variant_files(image)
+            )
+        return referenced
+
+    def collect(self, storage, names, kind):
+        """Удаляет пачку файлов вместе с их записями в хранилище ключей."""
+        if self.dry_run or not names:
+            return
+        keys = []
+        for name in names:
+            key = ImageFile(name, storage).key
+            keys.append(add_prefix(key))
+            if kind == 'image':
+                keys.append(add_prefix(key, 'thumbnails'))
+        default.kvstore._delete_raw(*keys)
+        for name in names:
+            storage.delete(name)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.cache import page_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает счётчики кэша страниц лент.'
+
+    def handle(self, *args, **options):
+        stats = page_cache_stats()
+        for metric, value in stats.items():
+            self.stdout.write(f'{metric}: {value}')
+        misses = stats['miss'] + stats['rebuild'] + stats['coalesced']
+        if misses:
+            self.stdout.write(
+                f'объединено промахов: {stats["coalesced"] / misses:.1%}'
+            )
@@ -0,0 +1,86 @@
+import os
+import shutil
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts import cache, thumbnails
+from posts.models import Post
+from posts.storage import is_sharded
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов в подкаталоги по хэшу содержимого '
+        'пачками и обновляет Post.image. Команду можно прервать и '
+        'запустить снова: уже перенесённые файлы пропускаются. '
+        'Миниатюры старых имён удаляются; новые можно сразу построить '
+        'командой backfill_image_variants.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        self.storage = Post._meta.get_field('image').storage
+        self.dry_run = options['dry_run']
+        posts = Post.objects.exclude(image='').order_by('pk')
+        moved = skipped = 0
+        last_pk = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk).values_list(
+                'pk', 'image'
+            )[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            names = {name for _, name in batch if not is_sharded(name)}
+            for name in sorted(names):
+                if self.move(name):
+                    moved += 1
+                else:
+                    skipped += 1
+            self.stdout.write(
+                f'До поста {last_pk}: перенесено {moved}, '
+                f'пропущено {skipped}'
+            )
+        self.stdout.write(f'Готово: перенесено {moved}, пропущено {skipped}')
+
+    def move(self, name):
+        """Переносит один файл; False, если перенести его нельзя.
+
+        Сначала файл появляется под новым именем, затем меняются записи,
+        и только потом удаляется старый файл, поэтому прерванный запуск
+        ничего не теряет.
+        """
+        storage = self.storage
+        try:
+            old_path = storage.path(name)
+        except SuspiciousFileOperation:
+            self.stderr.write(f'{name}: вне MEDIA_ROOT')
+            return False
+        if not os.path.exists(old_path):
+            self.stderr.write(f'{name}: файла нет')
+            return False
+        with storage.open(name) as content:
+            new_name = storage.content_name(name, content)
+        if self.dry_run:
+            self.stdout.write(f'{name} -> {new_name}')
+            return True
+        new_path = storage.path(new_name)
+        if not os.path.exists(new_path):
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            try:
+                os.link(old_path, new_path)
+            except OSError:
+                shutil.copy2(old_path, new_path)
+        with transaction.atomic():
+            affected = Post.objects.filter(image=name)
+            scopes = cache.queryset_scopes(affected)
+            affected.update(image=new_name, edited=timezone.now())
+        cache.bump(*scopes)
+        thumbnails.release(name)
+        return True
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:06
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def count_followers(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    FollowerCount = apps.get_model('posts', 'FollowerCount')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    limit = settings.TIMELINE_PUSH_FOLLOWER_LIMIT
+    counts = Follow.objects.values('author_id').annotate(count=Count('id'))
+    FollowerCount.objects.bulk_create(
+        (
+            FollowerCount(**row, pulled=row['count'] > limit)
+            for row in counts.iterator()
+        ),
+        batch_size=500,
+    )
+    # 0011 разложила посты всех авторов; популярные теперь читаются
+    # при показе ленты, и их записи дублировали бы эти посты.
+    TimelineEntry.objects.filter(
+        author__follower_count__pulled=True
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowerCount',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='follower_count', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('pulled', models.BooleanField(default=False, verbose_name='Посты читаются при показе ленты')),
+            ],
+            options={
+                'verbose_name': 'Число подписчиков',
+                'verbose_name_plural': 'Число подписчиков',
+            },
+        ),
+        migrations.RunPython(count_followers, migrations.RunPython.noop),
+    ]
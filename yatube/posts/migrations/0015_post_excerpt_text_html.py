@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:12
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+# Копии posts.models.make_excerpt и render_text на момент миграции:
+# дальнейшие правки кода не должны менять её результат.
+EXCERPT_WORDS = 30
+
+
+def make_excerpt(text):
+    return Truncator(text).words(EXCERPT_WORDS)
+
+
+def render_text(text):
+    return linebreaks(text, autoescape=True)
+
+
+def prepare_texts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    last_pk = 0
+    while True:
+        batch = list(
+            Post.objects.filter(pk__gt=last_pk).order_by('pk')
+            .only('pk', 'text')[:500]
+        )
+        if not batch:
+            break
+        for post in batch:
+            post.excerpt = make_excerpt(post.text)
+            post.text_html = render_text(post.text)
+        Post.objects.bulk_update(batch, ['excerpt', 'text_html'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_edited'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, verbose_name='Отрывок'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Текст в HTML'),
+        ),
+        migrations.RunPython(prepare_texts, migrations.RunPython.noop),
+    ]
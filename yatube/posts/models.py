@@ -1,8 +1,25 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+from .storage import ContentAddressedStorage
+from .uploads import describe
 
 User = get_user_model()
 
+EXCERPT_WORDS = 30
+
+LIST_DEFERRED_FIELDS = ('text', 'text_html')
+
+
+def make_excerpt(text):
+    return Truncator(text).words(EXCERPT_WORDS)
+
+
+def render_text(text):
+    return linebreaks(text, autoescape=True)
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -18,10 +35,24 @@ class Post(models.Model):
         'Текст поста',
         help_text='Введите текст поста'
     )
+    excerpt = models.TextField(
+        'Отрывок',
+        blank=True,
+        editable=False
+    )
+    text_html = models.TextField(
+        'Текст в HTML',
+        blank=True,
+        editable=False
+    )
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True
     )
+    edited = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -41,17 +72,78 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        blank=True,
+        null=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        blank=True,
+        null=True,
+        editable=False
+    )
+    image_preview = models.TextField(
+        'Превью картинки',
+        blank=True,
+        editable=False
+    )
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_feed_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_feed_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_feed_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def prepare_text(self):
+        """Отрывок и HTML считаются при записи, а не при каждом показе."""
+        self.excerpt = make_excerpt(self.text)
+        self.text_html = render_text(self.text)
+
+    def prepare_image(self):
+        """Размеры и превью считаются один раз, при загрузке картинки."""
+        if not self.image:
+            self.image_width = self.image_height = None
+            self.image_preview = ''
+        elif not self.image._committed:
+            try:
+                (self.image_width, self.image_height,
+                 self.image_preview) = describe(self.image.file)
+            except OSError:
+                self.image_width = self.image_height = None
+                self.image_preview = ''
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.prepare_text()
+            if update_fields is not None:
+                update_fields = {*update_fields, 'excerpt', 'text_html'}
+        if update_fields is None or 'image' in update_fields:
+            self.prepare_image()
+            if update_fields is not None:
+                update_fields = {
+                    *update_fields,
+                    'image_width', 'image_height', 'image_preview',
+                }
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
 
@@ -70,6 +162,10 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('created',)
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return 'Comment by {} on {}'.format(self.name, self.post)
@@ -95,3 +191,63 @@ class Follow(models.Model):
     class Meta:
         constraints = [models.UniqueConstraint(fields=['user', 'author'],
                                                name='unique_follows')]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Читатель',
+        related_name='timeline',
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        related_name='timeline_entries',
+        on_delete=models.CASCADE
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор поста',
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [models.UniqueConstraint(fields=['user', 'post'],
+                                               name='unique_timeline_posts')]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_feed_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+
+class FollowerCount(models.Model):
+
+    author = models.OneToOneField(
+        User,
+        primary_key=True,
+        verbose_name='Автор',
+        related_name='follower_count',
+        on_delete=models.CASCADE
+    )
+    count = models.PositiveIntegerField('Подписчиков', default=0)
+    pulled = models.BooleanField(
+        'Посты читаются при показе ленты',
+        default=False
+    )
+
+    class Meta:
+        verbose_name = 'Число подписчиков'
+        verbose_name_plural = 'Число подписчиков'
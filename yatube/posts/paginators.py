@@ -0,0 +1,381 @@
+import base64
+import binascii
+import functools
+import hashlib
+import heapq
+import itertools
+import operator
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from . import search
+from .cache import get_generations
+
+ELLIPSIS = '…'
+
+# Наибольшее целое SQLite: больше не бывает ни id, ни OFFSET.
+MAX_INTEGER = 2 ** 63 - 1
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def pack_cursor(*parts):
+    raw = '|'.join(str(part) for part in parts).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def unpack_cursor(token, size=2):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        parts = raw.decode().split('|')
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(token)
+    if len(parts) != size:
+        raise InvalidCursor(token)
+    return parts
+
+
+def cursor_pk(part, token):
+    try:
+        pk = int(part)
+    except ValueError:
+        raise InvalidCursor(token)
+    if not -MAX_INTEGER <= pk <= MAX_INTEGER:
+        raise InvalidCursor(token)
+    return pk
+
+
+def cached_value(raw, compute, timeout=None, scopes=()):
+    """compute(), закэшированное по строке raw.
+
+    С scopes в ключ входят поколения этих областей кэша страниц:
+    значение пересчитывается вместе со страницей, которая его показывает.
+    """
+    if timeout is None:
+        timeout = settings.PAGINATOR_COUNT_TIMEOUT
+    generations = get_generations(scopes) if scopes else []
+    raw = '|'.join([raw] + [str(generation) for generation in generations])
+    key = f'paginator:count:{hashlib.md5(raw.encode()).hexdigest()}'
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def cached_count(queryset, timeout=None, scopes=()):
+    """COUNT(*) запроса, закэшированный по его SQL."""
+    return cached_value(str(queryset.query), queryset.count, timeout, scopes)
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который берёт общее число записей из кэша.
+
+    Подходит и для лент, и для changelist в админке. scopes — области
+    кэша страниц, с поколениями которых сбрасывается счётчик.
+    """
+
+    def __init__(self, object_list, per_page, *args, scopes=(), **kwargs):
+        self.scopes = scopes
+        super().__init__(object_list, per_page, *args, **kwargs)
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            return cached_count(self.object_list, scopes=self.scopes)
+        return len(self.object_list)
+
+    def elided_page_range(self, number, has_next, on_each_side=2, on_ends=1):
+        last = max(self.num_pages, number + 1) if has_next else number
+        if last <= (on_each_side + on_ends) * 2:
+            return list(range(1, last + 1))
+        window = []
+        if number > on_each_side + on_ends + 1:
+            window.extend(range(1, on_ends + 1))
+            window.append(ELLIPSIS)
+            window.extend(range(number - on_each_side, number + 1))
+        else:
+            window.extend(range(1, number + 1))
+        if number < last - on_each_side - on_ends:
+            window.extend(range(number + 1, number + on_each_side + 1))
+            window.append(ELLIPSIS)
+            window.extend(range(last - on_ends + 1, last + 1))
+        else:
+            window.extend(range(number + 1, last + 1))
+        return window
+
+
+class CursorPaginator(CachedCountPaginator):
+    """Keyset-пагинация ленты по паре (pub_date, id).
+
+    Страницы ?after=/?before= выбираются по индексу без OFFSET,
+    ?page=N остаётся запасным вариантом для старых ссылок. Ни одна
+    страница не делает COUNT(*): наличие следующей страницы видно
+    по лишней (per_page + 1) строке выборки.
+    """
+
+    date_field = 'pub_date'
+    pk_field = 'pk'
+
+    def __init__(self, object_list, per_page, **kwargs):
+        object_list = object_list.order_by(
+            f'-{self.date_field}', f'-{self.pk_field}'
+        )
+        super().__init__(object_list, per_page, **kwargs)
+
+    def row_key(self, row):
+        if isinstance(row, dict):
+            return row[self.date_field], row[self.pk_field]
+        return getattr(row, self.date_field), getattr(row, self.pk_field)
+
+    def encode_cursor(self, row):
+        pub_date, pk = self.row_key(row)
+        return pack_cursor(pub_date.isoformat(), pk)
+
+    def decode_cursor(self, token):
+        date_part, pk_part = unpack_cursor(token)
+        try:
+            pub_date = parse_datetime(date_part)
+        except ValueError:
+            raise InvalidCursor(token)
+        if pub_date is None:
+            raise InvalidCursor(token)
+        return pub_date, cursor_pk(pk_part, token)
+
+    @staticmethod
+    def fetch_rows(queryset, date_field, pk_field, limit, cursor=None,
+                   reverse=False, offset=0):
+        """Строки после курсора в порядке ленты.
+
+        При reverse=True возвращаются строки перед курсором
+        в обратном (возрастающем) порядке.
+        """
+        queryset = queryset.order_by(f'-{date_field}', f'-{pk_field}')
+        if cursor is not None:
+            pub_date, pk = cursor
+            lookup = 'gt' if reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__{lookup}': pub_date})
+                | Q(**{date_field: pub_date, f'{pk_field}__{lookup}': pk})
+            )
+        if reverse:
+            queryset = queryset.reverse()
+        return list(queryset[offset:offset + limit])
+
+    def fetch(self, limit, cursor=None, reverse=False, offset=0):
+        return self.fetch_rows(
+            self.object_list, self.date_field, self.pk_field,
+            limit, cursor, reverse, offset,
+        )
+
+    def _cursor_page(self, rows, number, has_previous, has_next):
+        page = self._get_page(rows, number, self)
+        page.page_window = None
+        page.previous_cursor = (
+            self.encode_cursor(rows[0]) if has_previous and rows else None
+        )
+        page.next_cursor = (
+            self.encode_cursor(rows[-1]) if has_next and rows else None
+        )
+        return page
+
+    def first_page(self):
+        return self.page(1)
+
+    def page_after(self, token):
+        """Страница записей, идущих в ленте после курсора."""
+        rows = self.fetch(self.per_page + 1, self.decode_cursor(token))
+        has_next = len(rows) > self.per_page
+        return self._cursor_page(rows[:self.per_page], None, True, has_next)
+
+    def page_before(self, token):
+        """Страница записей, идущих в ленте перед курсором."""
+        rows = self.fetch(
+            self.per_page + 1, self.decode_cursor(token), reverse=True
+        )
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        if not has_previous:
+            return self.first_page()
+        return self._cursor_page(rows, None, True, True)
+
+    def page(self, number):
+        bottom = (number - 1) * self.per_page
+        rows = self.fetch(self.per_page + 1, offset=bottom)
+        has_next = len(rows) > self.per_page
+        page = self._cursor_page(
+            rows[:self.per_page], number, number > 1, has_next
+        )
+        page.page_window = self.elided_page_range(number, has_next)
+        return page
+
+    def get_page(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            number = 1
+        # Смещение страницы должно поместиться в целое SQLite, иначе
+        # запрос упадёт; такой страницы всё равно нет.
+        number = min(max(number, 1), MAX_INTEGER // self.per_page)
+        page = self.page(number)
+        if not page.object_list and number > 1:
+            page = self.page(self.num_pages)
+        return page
+
+    def get_request_page(self, request):
+        after = request.GET.get('after')
+        before = request.GET.get('before')
+        page_number = request.GET.get('page')
+        try:
+            if after:
+                return self.page_after(after)
+            if before:
+                return self.page_before(before)
+        except InvalidCursor:
+            return self.first_page()
+        if page_number:
+            return self.get_page(page_number)
+        return self.first_page()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок в гибридной схеме push/pull.
+
+    Посты обычных авторов лежат в TimelineEntry (push), посты авторов
+    с большим числом подписчиков читаются из Post по каждому автору
+    (pull). Источники сливаются k-way merge по ключу (pub_date, id).
+    Вместо моделей можно передать проекции .values(): поля поста
+    в записях ленты тогда выбираются с префиксом post__.
+    """
+
+    def __init__(self, entries, per_page, pulled=(), **kwargs):
+        self.entries = entries
+        self.pulled = list(pulled)
+        super().__init__(entries, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        count = cached_count(self.entries)
+        if self.pulled:
+            count += cached_count(functools.reduce(operator.or_, self.pulled))
+        return count
+
+    @staticmethod
+    def entry_post(entry):
+        if isinstance(entry, dict):
+            return {
+                key[len('post__'):]: value for key, value in entry.items()
+                if key.startswith('post__')
+            }
+        return entry.post
+
+    def fetch(self, limit, cursor=None, reverse=False, offset=0):
+        depth = offset + limit
+        sources = [[
+            self.entry_post(entry) for entry in self.fetch_rows(
+                self.entries, 'pub_date', 'post_id', depth, cursor, reverse
+            )
+        ]]
+        for queryset in self.pulled:
+            sources.append(self.fetch_rows(
+                queryset, 'pub_date', 'pk', depth, cursor, reverse
+            ))
+        merged = heapq.merge(*sources, key=self.row_key, reverse=not reverse)
+        seen = set()
+        keyed = ((self.row_key(post)[1], post) for post in merged)
+        unique = (
+            post for pk, post in keyed if pk not in seen and not seen.add(pk)
+        )
+        return list(itertools.islice(unique, offset, depth))
+
+
+class SearchPaginator(CursorPaginator):
+    """Выдача полнотекстового поиска по релевантности.
+
+    Ключ курсора — (ранг bm25, id) из индекса FTS5 вместо
+    (pub_date, id); посты страницы выбираются из object_list по id
+    одним запросом, ранг сохраняется в post.search_rank. Ранжируются
+    только SEARCH_RANK_WINDOW самых новых совпадений, более старые
+    идут за ними от новых к старым с рангом None.
+    """
+
+    def __init__(self, object_list, per_page, expression, **kwargs):
+        self.expression = expression
+        self.window = settings.SEARCH_RANK_WINDOW
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def floor(self):
+        return search.window_floor(
+            self.object_list.model, self.expression, self.window
+        )
+
+    @cached_property
+    def count(self):
+        # Номера страниц на первой странице выдачи читают count:
+        # подсчёт совпадений кэшируется до любого изменения постов.
+        model = self.object_list.model
+        return cached_value(
+            f'search|{model._meta.db_table}|{self.expression}',
+            lambda: search.count(model, self.expression),
+            scopes=('posts',),
+        )
+
+    def row_key(self, row):
+        return row.search_rank, row.pk
+
+    def encode_cursor(self, row):
+        rank, pk = self.row_key(row)
+        return pack_cursor('' if rank is None else repr(rank), pk)
+
+    def decode_cursor(self, token):
+        rank_part, pk_part = unpack_cursor(token)
+        pk = cursor_pk(pk_part, token)
+        if not rank_part:
+            return None, pk
+        try:
+            return float(rank_part), pk
+        except ValueError:
+            raise InvalidCursor(token)
+
+    def fetch_ranks(self, limit, cursor=None, reverse=False, offset=0):
+        """Пары (ранг, id): сначала окно по рангу, затем старые."""
+        model = self.object_list.model
+        if cursor is not None and cursor[0] is None:
+            ranks = [(None, pk) for pk in search.older(
+                model, self.expression, self.floor, limit, cursor[1],
+                reverse, offset,
+            )]
+            if reverse and len(ranks) < limit:
+                ranks += search.ranked(
+                    model, self.expression, limit - len(ranks),
+                    reverse=True, floor=self.floor,
+                )
+            return ranks
+        ranks = search.ranked(
+            model, self.expression, limit, cursor, reverse, offset,
+            self.floor,
+        )
+        if reverse or self.floor is None or len(ranks) == limit:
+            return ranks
+        return ranks + [(None, pk) for pk in search.older(
+            model, self.expression, self.floor, limit - len(ranks),
+            offset=max(offset - self.window, 0),
+        )]
+
+    def fetch(self, limit, cursor=None, reverse=False, offset=0):
+        ranks = self.fetch_ranks(limit, cursor, reverse, offset)
+        posts = self.object_list.in_bulk([pk for _, pk in ranks])
+        rows = []
+        for rank, pk in ranks:
+            if pk in posts:
+                posts[pk].search_rank = rank
+                rows.append(posts[pk])
+        return rows
@@ -0,0 +1,184 @@
+"""Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+Индексы posts_post_fts и posts_comment_fts внешние (content=): тексты
+не дублируются, а триггеры обновляют индекс в той же транзакции, что
+и запись. Пересборка таблицы при миграции SQLite удаляет её триггеры,
+поэтому repair() возвращает их после каждого migrate. На других базах
+поиск остаётся на icontains.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+# Таблица модели и индексируемая колонка.
+INDEXES = {
+    'posts_post': 'text',
+    'posts_comment': 'text',
+}
+
+TOKENIZER = 'unicode61 remove_diacritics 2'
+
+TERM = re.compile(r'\w+')
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def statements(table, column):
+    fts = fts_table(table)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column}, content='{table}', content_rowid='id', "
+        f"tokenize='{TOKENIZER}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} "
+        f"BEGIN INSERT INTO {fts}(rowid, {column}) "
+        f"VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} "
+        f"BEGIN INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update "
+        f"AFTER UPDATE OF {column} ON {table} "
+        f"BEGIN INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) "
+        f"VALUES (new.id, new.{column}); END",
+    ]
+
+
+def supported(db=connection):
+    return db.vendor == 'sqlite'
+
+
+def install(db=connection):
+    """Создаёт недостающие индексы и триггеры."""
+    if not supported(db):
+        return
+    with db.cursor() as cursor:
+        for table, column in INDEXES.items():
+            for statement in statements(table, column):
+                cursor.execute(statement)
+
+
+def rebuild(db=connection):
+    if not supported(db):
+        return
+    with db.cursor() as cursor:
+        for table in INDEXES:
+            fts = fts_table(table)
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def repair(db=connection):
+    """Возвращает триггеры, если индексы уже созданы миграцией."""
+    if not supported(db):
+        return
+    tables = set(db.introspection.table_names())
+    if all(fts_table(table) in tables for table in INDEXES):
+        install(db)
+
+
+def uninstall(db=connection):
+    if not supported(db):
+        return
+    with db.cursor() as cursor:
+        for table in INDEXES:
+            fts = fts_table(table)
+            for suffix in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+            cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+def match_expression(query):
+    """Запрос пользователя в выражение MATCH.
+
+    Каждое слово ищется как префикс и берётся в кавычки, поэтому
+    операторы FTS5 во вводе не срабатывают. Пустая строка — слов нет.
+    """
+    return ' '.join(f'"{term}"*' for term in TERM.findall(query))
+
+
+def matching_ids(model, expression):
+    """Подзапрос id записей модели, подходящих под выражение."""
+    fts = fts_table(model._meta.db_table)
+    return RawSQL(
+        f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', (expression,)
+    )
+
+
+def window_floor(model, expression, window):
+    """Наименьший id среди window самых новых совпадений или None.
+
+    bm25 считается для каждого совпадения, поэтому для частых слов
+    ранжирование ограничивается окном свежих записей: FTS5 отсекает
+    условие по rowid, не читая остальные.
+    """
+    fts = fts_table(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s '
+            f'ORDER BY rowid DESC LIMIT 1 OFFSET %s',
+            (expression, window - 1),
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def ranked(model, expression, limit, cursor=None, reverse=False,
+           offset=0, floor=None):
+    """Пары (ранг, id) по убыванию релевантности.
+
+    Ранг — bm25 из FTS5: чем меньше, тем лучше. Курсор (ранг, id)
+    продолжает выдачу без OFFSET; при reverse=True возвращаются
+    записи перед курсором в обратном порядке. floor отсекает записи
+    старше окна из window_floor().
+    """
+    fts = fts_table(model._meta.db_table)
+    sql = f'SELECT rank, rowid FROM {fts} WHERE {fts} MATCH %s'
+    params = [expression]
+    if floor is not None:
+        sql += ' AND rowid >= %s'
+        params.append(floor)
+    if cursor is not None:
+        rank, pk = cursor
+        op = '<' if reverse else '>'
+        sql += f' AND (rank {op} %s OR (rank = %s AND rowid {op} %s))'
+        params += [rank, rank, pk]
+    order = 'DESC' if reverse else 'ASC'
+    sql += f' ORDER BY rank {order}, rowid {order} LIMIT %s OFFSET %s'
+    params += [limit, offset]
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        return db_cursor.fetchall()
+
+
+def older(model, expression, floor, limit, cursor=None, reverse=False,
+          offset=0):
+    """Id совпадений старше окна из window_floor(), от новых к старым.
+
+    В выдаче они идут после ранжированных, уже без bm25. Курсор —
+    id последней показанной записи; reverse=True как в ranked().
+    """
+    fts = fts_table(model._meta.db_table)
+    sql = f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s AND rowid < %s'
+    params = [expression, floor]
+    if cursor is not None:
+        op = '>' if reverse else '<'
+        sql += f' AND rowid {op} %s'
+        params.append(cursor)
+    order = 'ASC' if reverse else 'DESC'
+    sql += f' ORDER BY rowid {order} LIMIT %s OFFSET %s'
+    params += [limit, offset]
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        return [row[0] for row in db_cursor.fetchall()]
+
+
+def count(model, expression):
+    fts = fts_table(model._meta.db_table)
+    sql = f'SELECT COUNT(*) FROM {fts} WHERE {fts} MATCH %s'
+    params = [expression]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()[0]
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_save
+)
+from django.dispatch import receiver
+
+from . import cache, search, storage, thumbnails, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.push_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def timeline_on_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def timeline_on_unfollow(sender, instance, **kwargs):
+    timeline.unfollow(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_state(sender, instance, raw=False, **kwargs):
+    instance._old_group_slug = instance._old_image = None
+    instance._image_uploaded = bool(instance.image) and not (
+        instance.image._committed
+    )
+    if instance.pk and not raw:
+        instance._old_group_slug, instance._old_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group__slug', 'image').first() or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, raw=False, **kwargs):
+    old_image = getattr(instance, '_old_image', None)
+    image = instance.image.name
+    if getattr(instance, '_image_uploaded', False):
+        transaction.on_commit(lambda: storage.settle(image))
+    if old_image and old_image != image:
+        transaction.on_commit(lambda: thumbnails.release(old_image))
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    image = instance.image.name
+    if image:
+        transaction.on_commit(lambda: thumbnails.release(image))
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    cache.bump(*cache.post_scopes(
+        instance, getattr(instance, '_old_group_slug', None)
+    ))
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_pages(sender, instance, **kwargs):
+    cache.bump(*cache.post_scopes(instance))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    cache.bump('groups')
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_pages(sender, instance, created, update_fields=None,
+                          **kwargs):
+    if created or update_fields == frozenset(['last_login']):
+        return
+    cache.bump('users', f'author:{instance.username}')
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user_pages(sender, instance, **kwargs):
+    cache.bump('users', f'author:{instance.username}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_profile_pages(sender, instance, **kwargs):
+    cache.bump(f'author:{instance.author.username}')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_detail(sender, instance, **kwargs):
+    cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_migrate)
+def repair_search_triggers(sender, using, **kwargs):
+    if sender.name == 'posts':
+        search.repair(connections[using])
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import re
+import time
+
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+SHARD_LEVELS = 2
+
+SHARD_WIDTH = 2
+
+DIGEST = re.compile(r'[0-9a-f]{64}')
+
+LOCK_TIMEOUT = 10
+
+CLAIM_TIMEOUT = 60 * 60
+
+
+def shard_path(digest):
+    """Подкаталоги по первым символам хэша: 'ab/cd'."""
+    return '/'.join(
+        digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH]
+        for level in range(SHARD_LEVELS)
+    )
+
+
+def is_sharded(name):
+    """Лежит ли файл под своим хэшем в своём подкаталоге."""
+    directory, filename = os.path.split(name)
+    digest = os.path.splitext(filename)[0]
+    return (
+        DIGEST.fullmatch(digest) is not None
+        and directory.endswith(shard_path(digest))
+    )
+
+
+def lock(name, wait=True):
+    """Межпроцессная блокировка имени: cache.add атомарен в общем кэше.
+
+    Без ожидания возвращает False, если имя занято; с ожиданием ждёт,
+    пока блокировку снимут или у неё выйдет срок.
+    """
+    while not cache.add(f'image:{name}:lock', 1, LOCK_TIMEOUT):
+        if not wait:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def unlock(name):
+    cache.delete(f'image:{name}:lock')
+
+
+def claim(name):
+    """Отмечает загрузку, чей пост ещё не закоммичен."""
+    key = f'image:{name}:claims'
+    cache.add(key, 0, CLAIM_TIMEOUT)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, CLAIM_TIMEOUT)
+
+
+def settle(name):
+    """Снимает отметку загрузки: пост закоммичен и сам ссылается на файл."""
+    try:
+        cache.decr(f'image:{name}:claims')
+    except ValueError:
+        pass
+
+
+def is_claimed(name):
+    return cache.get(f'image:{name}:claims', 0) > 0
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла — sha256 его содержимого.
+
+    Внутри каталога из upload_to файл лежит в подкаталогах по первым
+    символам хэша (posts/ab/cd/abcd….jpg), чтобы ни в одном каталоге
+    не копились миллионы файлов; имя загрузки заменяется хэшем
+    с исходным расширением. Повторная загрузка той же картинки не
+    пишет файл заново и получает то же имя, а значит, и те же
+    миниатюры sorl-thumbnail. Число ссылок — это число постов с этим
+    именем в Post.image; файл удаляется с последней ссылкой
+    (см. thumbnails.release).
+
+    Пока пост с загрузкой не закоммичен, ссылки на файл в базе ещё нет,
+    поэтому загрузка под блокировкой имени отмечает его через claim,
+    а release под той же блокировкой не трогает отмеченные файлы.
+    Отметку снимает settle после коммита поста; если коммита не было,
+    она истекает сама, а файл без ссылок подберёт collect_media.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return '/'.join(filter(None, (
+            os.path.dirname(name), shard_path(digest), f'{digest}{extension}'
+        )))
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        lock(name)
+        try:
+            claim(name)
+            if self.exists(name):
+                return name
+            return super()._save(name, content)
+        finally:
+            unlock(name)
@@ -0,0 +1,38 @@
+from django import template
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts.cache import get_generations
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_key(post, generations):
+    return 'post_card:{}:{}:{}'.format(
+        post.pk, post.edited.timestamp(), ':'.join(map(str, generations))
+    )
+
+
+@register.simple_tag
+def post_cards(posts):
+    """HTML карточек постов страницы из кэша, одним get_many.
+
+    Карточка не зависит от читателя; её ключ меняется при правке поста,
+    а также при изменении любых авторов или групп.
+    """
+    generations = get_generations(('users', 'groups'))
+    keys = {card_key(post, generations): post for post in posts}
+    cache = caches[settings.POSTS_CARD_CACHE]
+    cards = cache.get_many(keys)
+    missing = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in keys.items() if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, settings.POSTS_CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
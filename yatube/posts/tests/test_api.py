@@ -0,0 +1,161 @@
+import datetime
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+from posts import api
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    """Проверка JSON API лент."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            for i in range(13)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response.status_code, json.loads(response.content)
+
+    def test_feeds_follow_cursors(self):
+        """Ленты листаются курсорами и отдают посты по убыванию даты."""
+        expected = [post.pk for post in reversed(self.posts)]
+        for url in (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=(self.group.slug,)),
+            reverse('posts:api_profile', args=(self.author.username,)),
+        ):
+            with self.subTest(url=url):
+                _, first = self.get_json(url)
+                _, second = self.get_json(url, after=first['next'])
+                self.assertEqual(
+                    [post['id'] for post in first['results']
+                     + second['results']],
+                    expected,
+                )
+                self.assertIsNone(second['next'])
+                self.assertEqual(first['results'][0]['author'], 'author')
+                self.assertEqual(first['results'][0]['group'], 'api-group')
+
+    def test_sparse_fields(self):
+        """?fields= оставляет только запрошенные поля."""
+        _, data = self.get_json(reverse('posts:api_index'), fields='id,text')
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        status, data = self.get_json(
+            reverse('posts:api_index'), fields='id,password'
+        )
+        self.assertEqual(status, 400)
+        self.assertIn('password', data['error'])
+
+    def test_follow_feed(self):
+        """Лента подписок доступна только авторизованному читателю."""
+        status, _ = self.get_json(reverse('posts:api_follow_index'))
+        self.assertEqual(status, 401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        _, data = self.get_json(
+            reverse('posts:api_follow_index'), fields='id'
+        )
+        self.assertEqual(
+            data['results'],
+            [{'id': post.pk} for post in reversed(self.posts[-10:])],
+        )
+
+    def test_post_detail(self):
+        """Пост отдаётся вместе с комментариями, чужой id — 404."""
+        _, data = self.get_json(
+            reverse('posts:api_post_detail', args=(self.posts[0].pk,))
+        )
+        self.assertEqual(data['text'], 'Пост 0')
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['Комментарий'],
+        )
+        status, _ = self.get_json(
+            reverse('posts:api_post_detail', args=(0,))
+        )
+        self.assertEqual(status, 404)
+
+    def test_posts_batch(self):
+        """Пакет постов: порядок запроса, ненайденные id и два запроса."""
+        ids = [self.posts[2].pk, 0, self.posts[0].pk]
+        with self.assertNumQueries(2):
+            _, data = self.get_json(
+                reverse('posts:api_posts_batch'),
+                ids=','.join(map(str, ids)),
+                fields='id,author_posts_count',
+            )
+        self.assertEqual(data['results'], [
+            {'id': self.posts[2].pk, 'author_posts_count': 13},
+            {'id': self.posts[0].pk, 'author_posts_count': 13},
+        ])
+        self.assertEqual(data['missing'], [0])
+
+    def test_users_and_groups_batch(self):
+        """Пакеты авторов и групп возвращают число постов."""
+        _, users = self.get_json(
+            reverse('posts:api_users_batch'),
+            usernames='reader,nobody,author',
+            fields='username,posts_count',
+        )
+        self.assertEqual(users['results'], [
+            {'username': 'reader', 'posts_count': 0},
+            {'username': 'author', 'posts_count': 13},
+        ])
+        self.assertEqual(users['missing'], ['nobody'])
+        _, groups = self.get_json(
+            reverse('posts:api_groups_batch'), slugs='api-group'
+        )
+        self.assertEqual(groups['results'][0]['posts_count'], 13)
+        self.assertEqual(groups['missing'], [])
+
+    def test_batch_limits(self):
+        """Слишком большой или некорректный пакет отклоняется."""
+        url = reverse('posts:api_posts_batch')
+        too_many = ','.join(map(str, range(1, api.BATCH_LIMIT + 2)))
+        for ids in (too_many, 'abc', '', str(2 ** 64)):
+            with self.subTest(ids=ids):
+                status, _ = self.get_json(url, ids=ids)
+                self.assertEqual(status, 400)
+
+
+class DumpsTest(SimpleTestCase):
+
+    def test_orjson_formats_dates_like_json(self):
+        """С orjson и без него даты в ответе одинаковые."""
+        data = {'pub_date': datetime.datetime(
+            2021, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc
+        ), 'text': 'Пост'}
+        orjson = api.orjson
+        try:
+            fast = api.dumps(data)
+            api.orjson = None
+            self.assertEqual(json.loads(fast), json.loads(api.dumps(data)))
+        finally:
+            api.orjson = orjson
+        self.assertEqual(
+            json.loads(fast)['pub_date'], '2021-05-01T12:30:15.123Z'
+        )
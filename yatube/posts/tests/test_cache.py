@@ -1,6 +1,10 @@
+from unittest import mock
+
 from django.core.cache import cache
 from django.test import TestCase, Client
-from posts.models import Post, Group
+from posts import cache as page_cache
+from posts.models import Follow, Post, Group
+from posts.templatetags import post_cards
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 User = get_user_model()
@@ -22,6 +26,7 @@ class TaskCacheTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         for _ in range(NUM_P):
             Post.objects.create(
                 text="Текст поста",
@@ -35,13 +40,177 @@ class TaskCacheTests(TestCase):
 
     def test_cache(self):
         """Проверка хранения в кэше"""
-        response = self.authorized_client.get(reverse('posts:index_page'))
-        res_1 = response.content
-        cache.set('my_cache', res_1, 20)
-        post_del = Post.objects.get(id=1)
-        post_del.delete()
-        response_2 = self.authorized_client.get(reverse('posts:index_page'))
-        res_2 = response_2.content
-        self.assertTrue(res_1 == res_2)
-        cache.clear()
-        self.assertIsNone(cache.get('my_cache'))
+        response = self.guest_client.get(reverse('posts:index_page'))
+        with self.assertNumQueries(1):
+            response_2 = self.guest_client.get(reverse('posts:index_page'))
+        self.assertEqual(response.content, response_2.content)
+
+    def test_profile_count_follows_new_post(self):
+        """Число постов в профиле обновляется вместе со страницей"""
+        url = reverse('posts:profile', kwargs={'username': self.user.username})
+        response = self.guest_client.get(url)
+        self.assertEqual(response.context['posts_count'], NUM_P)
+        Post.objects.create(text="Ещё пост", author=self.user)
+        response = self.guest_client.get(url)
+        self.assertEqual(response.context['posts_count'], NUM_P + 1)
+        self.assertContains(response, f'Всего постов: {NUM_P + 1}')
+
+    def test_cache_stats_for_staff(self):
+        """Счётчики кэшей видны только персоналу"""
+        url = reverse('posts:cache_stats')
+        self.assertEqual(self.guest_client.get(url).status_code, 302)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(reverse('posts:index_page'))
+        data = self.client.get(url).json()
+        self.assertIn('hit', data['page_cache'])
+        self.assertIn('post_card', data['caches']['local'])
+
+    def test_cache_invalidated_on_change(self):
+        """Изменение поста сразу видно на закэшированных страницах"""
+        urls = (
+            reverse('posts:index_page'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        before = [self.guest_client.get(url).content for url in urls]
+        Post.objects.create(
+            text="Свежий пост", author=self.user, group=self.group
+        )
+        for url, content in zip(urls, before):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertNotEqual(response.content, content)
+                self.assertIn('Свежий пост', response.content.decode())
+
+    def test_pages_are_cached_per_page_number(self):
+        """Вторая страница не совпадает с закэшированной первой"""
+        first = self.guest_client.get(reverse('posts:index_page'))
+        second = self.guest_client.get(
+            reverse('posts:index_page') + '?page=2'
+        )
+        self.assertNotEqual(first.content, second.content)
+
+    def test_post_edit_rerenders_only_its_card(self):
+        """Правка поста перерисовывает только его карточку"""
+        self.guest_client.get(reverse('posts:index_page'))
+        post = Post.objects.filter(author=self.user).first()
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Исправленный текст', 'group': self.group.pk},
+        )
+        with mock.patch.object(
+            post_cards, 'render_to_string', wraps=post_cards.render_to_string
+        ) as render:
+            response = self.guest_client.get(reverse('posts:index_page'))
+        self.assertEqual(render.call_count, 1)
+        self.assertIn('Исправленный текст', response.content.decode())
+
+    def expire_index_page(self):
+        """Делает закэшированную главную страницу устаревшей"""
+        response = self.guest_client.get(reverse('posts:index_page'))
+        key = page_cache.page_key(
+            response.wsgi_request, page_cache.index_scopes(None)
+        )
+        content, content_type, _ = cache.get(key)
+        cache.set(key, (b'stale', content_type, 0))
+        return key
+
+    def test_stale_page_served_while_rebuilding(self):
+        """Пока страницу пересобирают, отдаётся устаревшая копия"""
+        key = self.expire_index_page()
+        page_cache.acquire(key)
+        coalesced = page_cache.page_cache_stats()['coalesced']
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(reverse('posts:index_page'))
+        self.assertEqual(response.content, b'stale')
+        self.assertEqual(
+            page_cache.page_cache_stats()['coalesced'], coalesced + 1
+        )
+
+    def test_hit_does_not_write_shared_cache(self):
+        """Попадание считается в памяти процесса, без записи в кэш"""
+        url = reverse('posts:index_page')
+        self.guest_client.get(url)
+        hits = page_cache.page_cache_stats()['hit']
+        with mock.patch.object(cache, 'add') as add, \
+                mock.patch.object(cache, 'incr') as incr:
+            self.guest_client.get(url)
+        add.assert_not_called()
+        incr.assert_not_called()
+        self.assertEqual(page_cache.page_cache_stats()['hit'], hits + 1)
+
+    def test_stale_page_rebuilt_by_one_request(self):
+        """Первый запрос после истечения TTL пересобирает страницу"""
+        key = self.expire_index_page()
+        response = self.guest_client.get(reverse('posts:index_page'))
+        self.assertNotEqual(response.content, b'stale')
+        self.assertIn(b'<!--hole:header?-->', cache.get(key)[0])
+        self.assertTrue(page_cache.acquire(key))
+
+    def test_one_page_entry_for_all_users(self):
+        """Гость и автор получают страницы из одной записи кэша"""
+        other = User.objects.create(username='reader')
+        Follow.objects.create(user=other, author=self.user)
+        reader_client = Client()
+        reader_client.force_login(other)
+        url = reverse('posts:profile', kwargs={'username': self.user.username})
+        self.guest_client.get(url)
+        with mock.patch.object(
+            post_cards, 'render_to_string'
+        ) as render:
+            own = self.authorized_client.get(url)
+            reader = reader_client.get(url)
+        render.assert_not_called()
+        self.assertContains(own, 'Пользователь: Alex1')
+        self.assertContains(own, 'Подписаться')
+        self.assertContains(reader, 'Пользователь: reader')
+        self.assertContains(reader, 'Отписаться')
+        self.assertNotContains(reader, '<!--hole:')
+
+    def test_conditional_get_returns_not_modified(self):
+        """Повторный запрос с ETag получает 304 без рендеринга"""
+        urls = (
+            reverse('posts:index_page'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': Post.objects.first().pk}
+            ),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                with mock.patch.object(
+                    post_cards, 'render_to_string'
+                ) as render, self.assertNumQueries(1):
+                    not_modified = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(not_modified.status_code, 304)
+                render.assert_not_called()
+
+    def test_post_detail_ignores_other_authors(self):
+        """Страница поста меняется от постов его автора, но не чужих"""
+        post = Post.objects.first()
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        etag = self.guest_client.get(url)['ETag']
+        other = User.objects.create(username='other')
+        Post.objects.create(text="Чужой пост", author=other)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text="Ещё пост", author=self.user)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['post_count'], NUM_P + 1)
+
+    def test_conditional_get_sees_new_comment(self):
+        """Новый комментарий меняет ETag страницы поста"""
+        post = Post.objects.first()
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        etag = self.guest_client.get(url)['ETag']
+        post.comments.create(author=self.user, text='Комментарий')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -32,3 +32,19 @@ class PostModelTest(TestCase):
         group = PostModelTest.group
         expected_object_name = group.title
         self.assertEqual(expected_object_name, str(group))
+
+    def test_post_text_prepared_on_save(self):
+        """Отрывок и HTML текста пересчитываются при сохранении."""
+        post = Post.objects.create(
+            author=PostModelTest.user,
+            text='слово ' * 40 + '\n\n<b>конец</b>',
+        )
+        self.assertEqual(post.excerpt, ('слово ' * 30).strip() + '…')
+        post.text = 'Первый абзац\n\n<b>второй</b>'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'Первый абзац <b>второй</b>')
+        self.assertEqual(
+            post.text_html,
+            '<p>Первый абзац</p>\n\n<p>&lt;b&gt;второй&lt;/b&gt;</p>',
+        )
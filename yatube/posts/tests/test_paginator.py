@@ -1,7 +1,14 @@
+import base64
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from posts.models import Post, Group
+from posts.paginators import CachedCountPaginator, ELLIPSIS
 
 User = get_user_model()
 
@@ -31,6 +38,7 @@ class PaginatorViewsTest(TestCase):
         ])
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -85,3 +93,79 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(
             len(response.context['page_obj']), SECOND_PAGE_COUNT_POSTS
         )
+
+    def test_cursor_pages_of_index(self):
+        """ Проверка: курсоры ?after= и ?before= листают ленту без OFFSET. """
+        first = self.client.get(reverse('posts:index_page'))
+        first_page = first.context['page_obj']
+        self.assertIsNone(first_page.previous_cursor)
+        second = self.client.get(
+            reverse('posts:index_page') + f'?after={first_page.next_cursor}'
+        )
+        second_page = second.context['page_obj']
+        self.assertEqual(len(second_page), SECOND_PAGE_COUNT_POSTS)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertFalse(
+            {post.pk for post in first_page}
+            & {post.pk for post in second_page}
+        )
+        back = self.client.get(
+            reverse('posts:index_page')
+            + f'?before={second_page.previous_cursor}'
+        )
+        self.assertEqual(
+            [post.pk for post in back.context['page_obj']],
+            [post.pk for post in first_page],
+        )
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """ Проверка: испорченный курсор открывает первую страницу. """
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user.username})
+            + '?after=broken'
+        )
+        self.assertEqual(
+            len(response.context['page_obj']), FIRST_PAGE_COUNT_POSTS
+        )
+
+    def test_out_of_range_page_and_cursor(self):
+        """ Проверка: огромные номер страницы и id в курсоре не дают 500. """
+        huge_page = self.client.get(
+            reverse('posts:index_page') + '?page=99999999999999999999'
+        )
+        self.assertEqual(huge_page.status_code, 200)
+        self.assertEqual(
+            len(huge_page.context['page_obj']), SECOND_PAGE_COUNT_POSTS
+        )
+        cursor = base64.urlsafe_b64encode(
+            f'{timezone.now().isoformat()}|{10 ** 20}'.encode()
+        ).decode().rstrip('=')
+        huge_pk = self.client.get(
+            reverse('posts:index_page') + f'?after={cursor}'
+        )
+        self.assertEqual(huge_pk.status_code, 200)
+        self.assertEqual(
+            len(huge_pk.context['page_obj']), FIRST_PAGE_COUNT_POSTS
+        )
+
+    def test_cursor_page_runs_no_count(self):
+        """ Проверка: страница по курсору не выполняет COUNT(*). """
+        first = self.client.get(reverse('posts:index_page'))
+        cursor = first.context['page_obj'].next_cursor
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index_page') + f'?after={cursor}')
+        self.assertFalse(
+            [q for q in queries if 'COUNT(' in q['sql'].upper()]
+        )
+
+    def test_elided_page_range(self):
+        """ Проверка: окно ссылок на страницы не растёт с их числом. """
+        paginator = CachedCountPaginator(list(range(1000)), 10)
+        self.assertEqual(
+            paginator.elided_page_range(50, has_next=True),
+            [1, ELLIPSIS, 48, 49, 50, 51, 52, ELLIPSIS, 100],
+        )
+        self.assertEqual(
+            paginator.elided_page_range(2, has_next=False), [1, 2]
+        )
@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+from posts.query_budgets import QUERY_BUDGETS
+
+User = get_user_model()
+
+AUTHORS = 5
+POSTS_PER_AUTHOR = 12
+
+
+@override_settings(TIMELINE_PUSH_FOLLOWER_LIMIT=2)
+class QueryBudgetTest(TestCase):
+    """Страницы укладываются в бюджет запросов из QUERY_BUDGETS."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='Описание'
+            )
+            for i in range(2)
+        ]
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author-{i}', first_name='Имя', last_name='Фамилия'
+            )
+            for i in range(AUTHORS)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+        for reader in cls.authors[1:]:
+            Follow.objects.create(user=reader, author=cls.authors[0])
+        for i in range(POSTS_PER_AUTHOR):
+            for author in cls.authors:
+                Post.objects.create(
+                    text=f'Пост {i}', author=author, group=cls.groups[i % 2]
+                )
+        cls.post = Post.objects.create(text='Свой пост', author=cls.user)
+        for author in cls.authors:
+            Comment.objects.create(post=cls.post, author=author, text='Да')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(QueryBudgetTest.user)
+
+    def urls(self):
+        return {
+            'posts:index_page': reverse('posts:index_page'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.groups[0].slug}
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': self.authors[0].username}
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def test_every_budget_has_a_page(self):
+        """У каждого бюджета есть проверяемая страница."""
+        self.assertEqual(set(QUERY_BUDGETS), set(self.urls()))
+
+    def test_pages_fit_query_budget(self):
+        """Число запросов страницы не превышает бюджет."""
+        for name, url in self.urls().items():
+            for query in ('', '?page=2'):
+                with self.subTest(name=name, query=query):
+                    cache.clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.client.get(url + query)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertLessEqual(
+                        len(queries), QUERY_BUDGETS[name],
+                        '\n'.join(q['sql'] for q in queries),
+                    )
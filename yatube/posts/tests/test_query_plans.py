@@ -0,0 +1,89 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FEED_TABLES = (
+    'posts_post', 'posts_comment', 'posts_follow',
+    'posts_timelineentry', 'posts_followercount',
+)
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)\b(?! USING)')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+@override_settings(TIMELINE_PUSH_FOLLOWER_LIMIT=1)
+class QueryPlanTest(TestCase):
+    """Запросы лент должны идти по индексам, без полного скана и сортировки."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.star = User.objects.create_user(username='star')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.star)
+        Follow.objects.create(user=cls.fan, author=cls.star)
+        Follow.objects.create(user=cls.star, author=cls.fan)
+        for author in (cls.user, cls.star, cls.fan):
+            for i in range(15):
+                Post.objects.create(
+                    text=f'Пост {i}', author=author, group=cls.group
+                )
+        cls.post = Post.objects.filter(author=cls.user).first()
+        Comment.objects.create(post=cls.post, author=cls.user, text='Текст')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(QueryPlanTest.user)
+
+    def capture(self, url):
+        statements = []
+
+        def hook(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(hook):
+            self.client.get(url)
+            self.client.get(url + '?page=2')
+        return [
+            (sql, params) for sql, params in statements
+            if sql.startswith('SELECT')
+            and any(table in sql for table in FEED_TABLES)
+        ]
+
+    def assert_indexed(self, url):
+        statements = self.capture(url)
+        self.assertTrue(statements)
+        with connection.cursor() as cursor:
+            for sql, params in statements:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                with self.subTest(url=url, sql=sql):
+                    self.assertNotIn('TEMP B-TREE', plan)
+                    scanned = set(FULL_SCAN.findall(plan))
+                    self.assertFalse(scanned & set(FEED_TABLES), plan)
+
+    def test_feed_query_plans(self):
+        """Каждая лента читается по составному индексу."""
+        urls = (
+            reverse('posts:index_page'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.star.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            self.assert_indexed(url)
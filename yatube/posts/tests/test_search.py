@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    """Проверка полнотекстового поиска."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_superuser(
+            username='searcher', email='searcher@example.com', password='pw'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:post_search'), {'q': query, **params}
+        )
+
+    def test_results_ranked_by_relevance(self):
+        """Лучшее совпадение выше, регистр и окончания не мешают."""
+        rare = Post.objects.create(
+            author=self.user, text='Кот спит. ' + 'Слово ' * 30
+        )
+        often = Post.objects.create(
+            author=self.user, text='Котики, коты и КОТ на диване.'
+        )
+        Post.objects.create(author=self.user, text='Про собак.')
+        response = self.search('кот')
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [often.pk, rare.pk],
+        )
+
+    def test_cursor_pages_keep_query(self):
+        """Страницы выдачи листаются курсором и не теряют запрос."""
+        Post.objects.bulk_create([
+            Post(author=self.user, text=f'Погода {"дождь " * i}')
+            for i in range(1, 16)
+        ])
+        first = self.search('дождь')
+        page_obj = first.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertContains(
+            first, '?q=%D0%B4%D0%BE%D0%B6%D0%B4%D1%8C&amp;after='
+        )
+        second = self.search('дождь', after=page_obj.next_cursor)
+        seen = [post.pk for post in page_obj]
+        rest = [post.pk for post in second.context['page_obj']]
+        self.assertEqual(len(rest), 5)
+        self.assertFalse(set(seen) & set(rest))
+
+    @override_settings(SEARCH_RANK_WINDOW=3)
+    def test_older_matches_follow_ranked_window(self):
+        """Совпадения старше окна идут после него от новых к старым."""
+        posts = [
+            Post.objects.create(
+                author=self.user, text=f'Частое слово {"частое " * (i % 4)}'
+            )
+            for i in range(15)
+        ]
+        newest = {post.pk for post in posts[-3:]}
+        older = [post.pk for post in posts[-4::-1]]
+        first = self.search('частое').context['page_obj']
+        shown = [post.pk for post in first]
+        self.assertEqual(set(shown[:3]), newest)
+        self.assertEqual(shown[3:], older[:7])
+        self.assertIsNone(first[3].search_rank)
+        second = self.search(
+            'частое', after=first.next_cursor
+        ).context['page_obj']
+        self.assertEqual([post.pk for post in second], older[7:])
+        self.assertEqual(
+            [post.pk for post in self.search(
+                'частое', page=2
+            ).context['page_obj']],
+            older[7:],
+        )
+        back = self.search(
+            'частое', before=second.previous_cursor
+        ).context['page_obj']
+        self.assertEqual([post.pk for post in back], shown)
+
+    def test_match_count_cached_until_posts_change(self):
+        """Подсчёт совпадений для номеров страниц не повторяется."""
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Снег') for _ in range(11)
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            self.search('снег')
+        self.assertTrue(
+            [query for query in queries if 'COUNT' in query['sql']]
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.search('снег')
+        self.assertFalse(
+            [query for query in queries if 'COUNT' in query['sql']]
+        )
+        Post.objects.create(author=self.user, text='Снег идёт')
+        page_obj = self.search('снег').context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 12)
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        post = Post.objects.create(author=self.user, text='Старое слово')
+        post.text = 'Новое слово'
+        post.save()
+        self.assertFalse(self.search('старое').context['page_obj'])
+        self.assertEqual(len(self.search('новое').context['page_obj']), 1)
+        post.delete()
+        self.assertFalse(self.search('новое').context['page_obj'])
+
+    def test_admin_changelists_use_index(self):
+        """Поиск в админке находит посты и комментарии по словам."""
+        post = Post.objects.create(author=self.user, text='Ёжик в тумане')
+        Post.objects.create(author=self.user, text='Другой пост')
+        Comment.objects.create(
+            post=post, author=self.user, text='Туманный комментарий'
+        )
+        self.client.force_login(self.user)
+        for url, expected in (
+            (reverse('admin:posts_post_changelist'), 'Ёжик в тумане'),
+            (reverse('admin:posts_comment_changelist'),
+             'Туманный комментарий'),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'q': 'ТУМАН'})
+                self.assertEqual(
+                    response.context['cl'].result_count, 1
+                )
+                self.assertContains(response, expected)
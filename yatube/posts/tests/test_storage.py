@@ -0,0 +1,161 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from PIL import Image
+from posts import storage, thumbnails
+from posts.models import Post
+from posts.storage import is_sharded
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def png(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 300), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    """Проверка хранения картинок по хэшу содержимого."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='memer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self, content, name='meme.PNG'):
+        return Post.objects.create(
+            author=self.user, text='Мем',
+            image=SimpleUploadedFile(name, content),
+        )
+
+    def test_duplicate_uploads_share_file(self):
+        """Одинаковые загрузки получают одно имя и один файл."""
+        content = png('green')
+        first = self.create_post(content, 'first.PNG')
+        second = self.create_post(content, 'second.png')
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            first.image.name, f'posts/{digest[:2]}/{digest[2:4]}/{digest}.png'
+        )
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)).count(
+                f'{digest}.png'
+            ), 1
+        )
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл и миниатюры удаляются вместе с последней ссылкой на них."""
+        with mock.patch.object(
+            transaction, 'on_commit', side_effect=lambda func: func()
+        ):
+            first = self.create_post(png('yellow'))
+            second = self.create_post(png('yellow'))
+            path = first.image.path
+            thumbnails.generate(first.pk)
+            thumbnail = thumbnails.lookup(first.image)
+            first.image = SimpleUploadedFile('other.png', png('black'))
+            first.save()
+            self.assertTrue(os.path.exists(path))
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(thumbnail.exists())
+        self.assertTrue(os.path.exists(first.image.path))
+
+    def test_release_keeps_file_of_uncommitted_upload(self):
+        """Файл, загруженный постом до его коммита, не удаляется."""
+        with mock.patch.object(
+            transaction, 'on_commit', side_effect=lambda func: func()
+        ):
+            post = self.create_post(png('red'))
+            name = post.image.name
+            post.delete()
+        self.assertFalse(os.path.exists(post.image.path))
+        post = self.create_post(png('red'))
+        Post.objects.filter(pk=post.pk).delete()
+        thumbnails.release(name)
+        self.assertTrue(os.path.exists(post.image.path))
+        storage.settle(name)
+        storage.lock(name)
+        thumbnails.release(name)
+        self.assertTrue(os.path.exists(post.image.path))
+        storage.unlock(name)
+        thumbnails.release(name)
+        self.assertFalse(os.path.exists(post.image.path))
+
+    def test_shard_media_moves_flat_files(self):
+        """Команда раскладывает старые файлы по подкаталогам повторяемо."""
+        post = Post.objects.create(author=self.user, text='Старый мем')
+        flat_path = os.path.join(TEMP_MEDIA_ROOT, 'posts', 'flat.png')
+        os.makedirs(os.path.dirname(flat_path), exist_ok=True)
+        with open(flat_path, 'wb') as file:
+            file.write(png('blue'))
+        Post.objects.filter(pk=post.pk).update(image='posts/flat.png')
+        for _ in range(2):
+            call_command('shard_media', stdout=io.StringIO())
+            post.refresh_from_db()
+            self.assertTrue(is_sharded(post.image.name))
+            self.assertTrue(os.path.exists(post.image.path))
+        self.assertFalse(os.path.exists(flat_path))
+
+    def test_collect_media_removes_only_orphans(self):
+        """Сборщик удаляет старые файлы без ссылок и не трогает нужные."""
+        post = self.create_post(png('white'))
+        thumbnails.generate(post.pk)
+        thumbnail = thumbnails.lookup(post.image)
+        variants = [
+            file.storage.path(file.name)
+            for _, _, file in thumbnails.variant_files(post.image)
+        ]
+        kept = [post.image.path, thumbnail.storage.path(thumbnail.name)]
+        old, fresh = [], []
+        for paths, name in (
+            (old, 'posts/ab/cd/old.png'),
+            (old, 'cache/ab/cd/old.jpg'),
+            (fresh, 'posts/fresh.png'),
+        ):
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(b'orphan')
+            paths.append(path)
+        for path in old:
+            os.utime(path, (0, 0))
+
+        def existing():
+            return [
+                os.path.exists(path) for path in kept + old + fresh
+            ]
+
+        out = io.StringIO()
+        call_command('collect_media', dry_run=True, min_age=0, stdout=out)
+        self.assertTrue(all(existing()))
+        self.assertIn('posts/: найдено 2 файлов', out.getvalue())
+        call_command('collect_media', stdout=io.StringIO())
+        self.assertEqual(existing(), [True, True, False, False, True])
+        call_command('collect_media', min_age=0, stdout=io.StringIO())
+        self.assertEqual(existing(), [True, True, False, False, False])
+        self.assertTrue(all(os.path.exists(path) for path in variants))
+        self.assertIsNotNone(thumbnails.lookup(post.image))
@@ -0,0 +1,106 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='photo.png', size=(1200, 800)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTest(TestCase):
+    """Проверка заранее сгенерированных миниатюр."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user, text='С картинкой', image=make_image()
+        )
+        self.client = Client()
+
+    def test_render_never_generates(self):
+        """Без миниатюры страница показывает заглушку и ставит задачу."""
+        with mock.patch.object(thumbnails, 'queue') as queue, \
+                mock.patch.object(thumbnails, 'get_thumbnail') as generate:
+            response = self.client.get(reverse('posts:index_page'))
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        queue.assert_called_once_with(self.post.pk)
+        generate.assert_not_called()
+
+    def test_generated_thumbnail_replaces_placeholder(self):
+        """После генерации карточка и страница перерисовываются."""
+        with mock.patch.object(thumbnails, 'queue'):
+            self.client.get(reverse('posts:index_page'))
+        edited = self.post.edited
+        thumbnails.generate(self.post.pk)
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.edited, edited)
+        thumbnail = thumbnails.lookup(self.post.image)
+        self.assertEqual(list(thumbnail.size), [960, 339])
+        response = self.client.get(reverse('posts:index_page'))
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, 'aspect-ratio: 960 / 339')
+
+    def test_thumbnail_lookup_cost_is_constant(self):
+        """Миниатюры страницы ищутся одним запросом при любом числе постов."""
+        def index_queries():
+            cache.clear()
+            with mock.patch.object(thumbnails, 'queue'), \
+                    CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('posts:index_page'))
+            return len(queries)
+
+        one_post = index_queries()
+        for _ in range(9):
+            Post.objects.create(
+                author=self.user, text='Ещё картинка', image=make_image()
+            )
+        self.assertEqual(index_queries(), one_post)
+        with mock.patch.object(thumbnails, 'queue'), mock.patch.object(
+            thumbnails.default.kvstore, '_get_raw'
+        ) as get_raw:
+            thumbnails.attach(Post.objects.all())
+        get_raw.assert_not_called()
+
+    def test_srcset_lists_generated_variants(self):
+        """После генерации у картинки есть srcset по настроенным ширинам."""
+        thumbnails.generate(self.post.pk)
+        response = self.client.get(reverse('posts:index_page'))
+        post = response.context['page_obj'][0]
+        for image_format, width in thumbnails.variants():
+            with self.subTest(image_format=image_format, width=width):
+                self.assertIn(f' {width}w', post.srcset[image_format])
+        self.assertContains(response, 'sizes="(max-width: 960px)')
+        _, _, small = thumbnails.variant_files(self.post.image)[0]
+        self.assertEqual(
+            list(thumbnails.lookup_many([small])[small.name].size),
+            [320, 113],
+        )
@@ -0,0 +1,161 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Follow, FollowerCount, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    """Проверка материализованной ленты подписок."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(TimelineTest.reader)
+
+    def timeline_posts(self):
+        return list(
+            TimelineEntry.objects.filter(
+                user=TimelineTest.reader
+            ).values_list('post_id', flat=True)
+        )
+
+    def test_follow_backfills_and_unfollow_purges(self):
+        """Подписка добавляет старые посты, отписка их убирает."""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        self.assertEqual(self.timeline_posts(), [self.old_post.pk])
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertEqual(self.timeline_posts(), [])
+
+    def test_followed_author_can_be_deleted(self):
+        """Удаление автора с подписчиками не ломает счётчики."""
+        author = User.objects.create_user(username='Leaving')
+        Post.objects.create(text='Пост', author=author)
+        Follow.objects.create(user=self.reader, author=author)
+        Follow.objects.create(user=author, author=self.author)
+        author.delete()
+        self.assertEqual(self.timeline_posts(), [])
+        self.assertFalse(
+            FollowerCount.objects.filter(author__username='Leaving').exists()
+        )
+        self.assertEqual(
+            FollowerCount.objects.get(author=self.author).count, 0
+        )
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост попадает в ленту подписчика и на /follow/."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(
+            self.timeline_posts(), [new_post.pk, self.old_post.pk]
+        )
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [new_post.pk, self.old_post.pk],
+        )
+
+
+@override_settings(
+    TIMELINE_PUSH_FOLLOWER_LIMIT=2,
+    TIMELINE_REPUSH_FOLLOWER_LIMIT=1,
+    TIMELINE_WORKERS=0,
+)
+class HybridTimelineTest(TestCase):
+    """Проверка гибридной ленты: популярные авторы читаются при показе."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.other_reader = User.objects.create_user(username='Other')
+        cls.third_reader = User.objects.create_user(username='Third')
+        cls.star = User.objects.create_user(username='Star')
+        cls.author = User.objects.create_user(username='Author')
+        for reader in (cls.reader, cls.other_reader, cls.third_reader):
+            Follow.objects.create(user=reader, author=cls.star)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(HybridTimelineTest.reader)
+
+    def star_entries(self):
+        return TimelineEntry.objects.filter(author=self.star)
+
+    def test_popular_author_posts_are_merged_on_read(self):
+        """Посты популярного автора не раскладываются, но видны в ленте."""
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=author)
+            for i, author in enumerate(
+                [self.star, self.author, self.star, self.author]
+            )
+        ]
+        self.assertFalse(self.star_entries().exists())
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [post.pk for post in reversed(posts)],
+        )
+
+    def test_author_pushed_again_below_lower_limit(self):
+        """Автор снова раскладывается только у нижнего порога."""
+        post = Post.objects.create(text='Пост', author=self.star)
+        with mock.patch.object(
+            transaction, 'on_commit', side_effect=lambda func: func()
+        ):
+            Follow.objects.filter(user=self.third_reader).delete()
+            self.assertFalse(self.star_entries().exists())
+            Follow.objects.filter(user=self.other_reader).delete()
+        self.assertEqual(
+            list(self.star_entries().values_list('user', 'post')),
+            [(self.reader.pk, post.pk)],
+        )
+        self.assertFalse(FollowerCount.objects.get(author=self.star).pulled)
+
+    def test_follow_toggle_at_limit_keeps_author_pulled(self):
+        """Подписка и отписка на границе не перекладывают записи."""
+        Post.objects.create(text='Пост', author=self.star)
+        with mock.patch.object(
+            transaction, 'on_commit', side_effect=lambda func: func()
+        ) as on_commit:
+            for _ in range(3):
+                Follow.objects.filter(user=self.third_reader).delete()
+                Follow.objects.create(user=self.third_reader, author=self.star)
+        on_commit.assert_not_called()
+        self.assertFalse(self.star_entries().exists())
+        self.assertTrue(FollowerCount.objects.get(author=self.star).pulled)
+
+    def test_author_over_limit_drops_pushed_entries(self):
+        """Ставший популярным автор убирается из разложенных лент."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Follow.objects.create(user=self.other_reader, author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(author=self.author).exists()
+        )
+        Follow.objects.create(user=self.third_reader, author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.author).exists()
+        )
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']], [post.pk]
+        )
+        self.assertEqual(response.context['paginator'].count, 1)
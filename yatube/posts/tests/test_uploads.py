@@ -0,0 +1,128 @@
+import io
+from unittest import mock
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from posts import thumbnails, uploads
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+ORIENTATION = 0x0112
+
+
+def jpeg(size, orientation=None):
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[ORIENTATION] = orientation
+    Image.new('RGB', size, 'blue').save(buffer, 'JPEG', exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_IMAGE_MAX_SIDE=500,
+    POST_IMAGE_MAX_UPLOAD_SIZE=200 * 1024,
+)
+class UploadTest(TestCase):
+    """Проверка потоковой загрузки картинок."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, content, name='photo.jpg'):
+        return self.client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            {'text': 'Пост', 'image': SimpleUploadedFile(name, content)},
+        )
+
+    def test_image_downscaled_and_exif_applied(self):
+        """Картинка уменьшается, поворот из EXIF применяется и стирается."""
+        response = self.upload(jpeg((1600, 800), orientation=6))
+        self.assertEqual(response.status_code, 302)
+        self.post.refresh_from_db()
+        with Image.open(self.post.image.path) as image:
+            self.assertEqual(image.size, (250, 500))
+            self.assertNotIn(ORIENTATION, image.getexif())
+
+    def test_extension_follows_format(self):
+        """Расширение файла берётся из формата, а не из имени загрузки."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(buffer, 'PNG')
+        self.upload(buffer.getvalue(), name='photo.jpg')
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.image.name.endswith('.png'))
+        with Image.open(self.post.image.path) as image:
+            self.assertEqual(image.format, 'PNG')
+
+    def test_rejected_uploads_explained(self):
+        """Не картинка и слишком большой файл отклоняются с причиной."""
+        cases = (
+            (b'not an image at all', 'Загрузите картинку'),
+            (b'\xff\xd8\xff' + b'\0' * 300 * 1024, 'Картинка больше'),
+        )
+        for content, message in cases:
+            with self.subTest(message=message):
+                response = self.upload(content)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(
+                    message, response.context['form'].errors['image'][0]
+                )
+        self.post.refresh_from_db()
+        self.assertFalse(self.post.image)
+
+    def test_dimensions_and_preview_stored(self):
+        """Размеры и превью сохраняются при загрузке, шаблон их не читает."""
+        self.upload(jpeg((1000, 400)))
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (500, 200)
+        )
+        self.assertTrue(
+            self.post.image_preview.startswith('data:image/jpeg;base64,')
+        )
+        with mock.patch.object(Image, 'open') as image_open, \
+                mock.patch.object(thumbnails, 'queue'):
+            response = self.client.get(
+                reverse('posts:post_detail', args=(self.post.pk,))
+            )
+        image_open.assert_not_called()
+        self.assertContains(response, self.post.image_preview)
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_backfill_image_previews(self):
+        """Команда заполняет размеры и превью старых постов."""
+        self.upload(jpeg((300, 200), orientation=6))
+        Post.objects.update(image_width=None, image_preview='')
+        call_command(
+            'backfill_image_previews', workers=1, stdout=io.StringIO()
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (200, 300)
+        )
+        self.assertEqual(
+            self.post.image_preview,
+            uploads.describe(self.post.image.file)[2],
+        )
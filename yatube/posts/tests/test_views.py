@@ -88,6 +88,24 @@ class PostPagesTests(TestCase):
         self.assertEqual(post_text_0, 'Тестовый заголовок')
         self.assertEqual(post_author_0, self.user)
 
+    def test_list_pages_defer_full_text(self):
+        """Ленты читают только отрывок, полный текст — лишь post_detail."""
+        urls = (
+            reverse('posts:index_page'),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                post = self.guest_client.get(url).context['page_obj'][0]
+                self.assertEqual(
+                    post.get_deferred_fields(), {'text', 'text_html'}
+                )
+        response = self.guest_client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        ))
+        self.assertEqual(response.context['post'].get_deferred_fields(), set())
+        self.assertContains(response, '<p>Тестовый заголовок</p>')
+
     def test_group_list_show_correct_context(self):
         """Шаблон group_list сформирован с правильным контекстом."""
         response = (self.guest_client.get(reverse(
@@ -0,0 +1,255 @@
+"""Миниатюры постов, сгенерированные заранее.
+
+Рендер страницы не работает с картинками: view одним обращением ищут
+готовые миниатюры страницы в хранилище ключей sorl-thumbnail, а шаблоны
+показывают заглушку там, где миниатюры ещё нет. Генерация идёт в пуле
+процессов после сохранения поста; закончив, воркер трогает Post.edited
+и сбрасывает поколения страниц поста, чтобы карточка и страницы
+перерисовались с картинкой.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default, delete, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import cache as page_cache
+from . import storage as content_storage
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+GEOMETRY = '960x339'
+
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+WIDTH, HEIGHT = 960, 339
+
+_executor = None
+
+
+def variant_geometry(width):
+    return f'{width}x{round(width * HEIGHT / WIDTH)}'
+
+
+def variants():
+    """Пары (формат, ширина) адаптивных вариантов.
+
+    Форматы, которые установленный Pillow не умеет сохранять,
+    пропускаются.
+    """
+    Image.init()
+    return [
+        (image_format, width)
+        for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in Image.SAVE
+        for width in settings.POST_IMAGE_WIDTHS
+    ]
+
+
+def thumbnail_file(image, geometry=GEOMETRY, **extra):
+    """ImageFile миниатюры под тем же именем, что даст get_thumbnail().
+
+    Повторяет подготовку опций из ThumbnailBackend.get_thumbnail(),
+    но не открывает исходную картинку.
+    """
+    backend = default.backend
+    source = ImageFile(image)
+    options = {**OPTIONS, **extra}
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def lookup(image):
+    """Готовая миниатюра или None; картинка не генерируется."""
+    if not image:
+        return None
+    return default.kvstore.get(thumbnail_file(image))
+
+
+def variant_files(image):
+    return [
+        (image_format, width, thumbnail_file(
+            image, variant_geometry(width), format=image_format
+        ))
+        for image_format, width in variants()
+    ]
+
+
+def lookup_many(files):
+    """Готовые миниатюры по именам файлов за один get_many.
+
+    files — ImageFile из thumbnail_file(). Промахи кэша дочитываются
+    из таблицы хранилища одним запросом и кэшируются, как это делает
+    сам KVStore.
+    """
+    kvstore = default.kvstore
+    keys = {add_prefix(file.key): file.name for file in files}
+    if not keys:
+        return {}
+    if isinstance(kvstore, CachedDBKVStore):
+        raw = kvstore.cache.get_many(keys)
+        missing = [key for key in keys if key not in raw]
+        if missing:
+            rows = dict(KVStoreModel.objects.filter(
+                key__in=missing
+            ).values_list('key', 'value'))
+            kvstore.cache.set_many(
+                {key: rows.get(key, EMPTY_VALUE) for key in missing},
+                sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+            )
+            raw.update(rows)
+    else:
+        raw = {key: kvstore._get_raw(key) for key in keys}
+    return {
+        name: (
+            deserialize_image_file(raw[key])
+            if raw.get(key) not in (None, EMPTY_VALUE) else None
+        )
+        for key, name in keys.items()
+    }
+
+
+def attach(posts):
+    """Проставляет миниатюры постам страницы.
+
+    post.thumbnail — основная миниатюра или None, post.srcset — строки
+    srcset по форматам из готовых вариантов. Если чего-то не хватает,
+    генерация ставится в очередь.
+    """
+    posts = list(posts)
+    plan = [
+        (post, thumbnail_file(post.image), variant_files(post.image))
+        for post in posts if post.image
+    ]
+    found = lookup_many(
+        file for _, main, files in plan
+        for file in [main] + [file for _, _, file in files]
+    )
+    for post in posts:
+        post.thumbnail = None
+        post.srcset = {}
+    for post, main, files in plan:
+        post.thumbnail = found[main.name]
+        srcset = {}
+        for image_format, width, file in files:
+            if found[file.name] is not None:
+                srcset.setdefault(image_format, []).append(
+                    f'{found[file.name].url} {width}w'
+                )
+        post.srcset = {
+            image_format: ', '.join(items)
+            for image_format, items in srcset.items()
+        }
+        if post.thumbnail is None or any(
+            found[file.name] is None for _, _, file in files
+        ):
+            queue(post.pk)
+    return posts
+
+
+def generate(post_id):
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id
+    ).first()
+    if post is None or not post.image:
+        return
+    get_thumbnail(post.image, GEOMETRY, **OPTIONS)
+    for image_format, width in variants():
+        get_thumbnail(
+            post.image, variant_geometry(width),
+            format=image_format, **OPTIONS
+        )
+    if lookup(post.image) is None:
+        # Исходного файла нет: sorl не сохранил миниатюру, трогать
+        # страницы незачем.
+        return
+    Post.objects.filter(pk=post_id).update(edited=timezone.now())
+    page_cache.bump(*page_cache.post_scopes(post))
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        # Воркеры наследуют соединения родителя при fork: закрываем их,
+        # чтобы каждый процесс открыл свои.
+        _executor = ProcessPoolExecutor(
+            settings.THUMBNAIL_WORKERS, initializer=connections.close_all
+        )
+    return _executor
+
+
+def log_failure(future):
+    if future.exception() is not None:
+        logger.error(
+            'Thumbnail generation failed', exc_info=future.exception()
+        )
+
+
+def queue(post_id, force=False):
+    """Ставит генерацию в очередь, не чаще раза в THUMBNAIL_QUEUE_TIMEOUT.
+
+    При THUMBNAIL_WORKERS = 0 миниатюра генерируется сразу.
+    """
+    key = f'thumbnail:queued:{post_id}'
+    if force:
+        cache.set(key, 1, settings.THUMBNAIL_QUEUE_TIMEOUT)
+    elif not cache.add(key, 1, settings.THUMBNAIL_QUEUE_TIMEOUT):
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        generate(post_id)
+        return
+    executor().submit(generate, post_id).add_done_callback(log_failure)
+
+
+def queue_on_commit(post):
+    post_id = post.pk
+    transaction.on_commit(lambda: queue(post_id, force=True))
+
+
+def release(name):
+    """Удаляет картинку, на которую не ссылается ни один пост.
+
+    Вместе с оригиналом удаляются все его миниатюры и варианты,
+    известные хранилищу ключей sorl-thumbnail. Файл, который сейчас
+    загружают заново, не удаляется; если имя занято загрузкой, файл
+    остаётся сборщику collect_media.
+    """
+    if not name or not content_storage.lock(name, wait=False):
+        return
+    try:
+        if (
+            content_storage.is_claimed(name)
+            or Post.objects.filter(image=name).exists()
+        ):
+            return
+        storage = Post._meta.get_field('image').storage
+        try:
+            storage.path(name)
+        except SuspiciousFileOperation:
+            logger.warning('Image %s is outside of the media storage', name)
+            return
+        delete(ImageFile(name, storage))
+    finally:
+        content_storage.unlock(name)
@@ -0,0 +1,190 @@
+"""Лента подписок: push для обычных авторов, pull для популярных.
+
+Автор переходит на pull, когда подписчиков становится больше
+TIMELINE_PUSH_FOLLOWER_LIMIT, а обратно на push — только когда их
+не больше TIMELINE_REPUSH_FOLLOWER_LIMIT. Разрыв между порогами
+не даёт одной подписке и отписке на границе каждый раз удалять
+и заново раскладывать все записи автора. Обратная раскладка идёт
+в фоне после коммита, а не в запросе отписки.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import (
+    LIST_DEFERRED_FIELDS, Follow, FollowerCount, Post, TimelineEntry
+)
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def follower_count(author_id):
+    return FollowerCount.objects.filter(
+        author_id=author_id
+    ).values_list('count', flat=True).first() or 0
+
+
+def is_pulled(author_id):
+    """Посты автора читаются при показе ленты, а не раскладываются."""
+    return FollowerCount.objects.filter(
+        author_id=author_id, pulled=True
+    ).exists()
+
+
+def change_follower_count(author_id, delta):
+    """Новое число подписчиков или None, если счётчика нет.
+
+    Счётчик уменьшается только существующий: при удалении автора
+    каскад удаляет его раньше, чем подписки на автора.
+    """
+    counts = FollowerCount.objects.filter(author_id=author_id)
+    if delta > 0:
+        FollowerCount.objects.get_or_create(author_id=author_id)
+    else:
+        counts = counts.filter(count__gte=-delta)
+    if not counts.update(count=F('count') + delta):
+        return None
+    return follower_count(author_id)
+
+
+def pulled_feeds(user):
+    """Querysets постов популярных авторов, на которых подписан user."""
+    authors = FollowerCount.objects.filter(
+        author__following__user=user, pulled=True,
+    ).values_list('author_id', flat=True)
+    posts = Post.objects.select_related(
+        'author', 'group'
+    ).defer(*LIST_DEFERRED_FIELDS)
+    return [posts.filter(author_id=author_id) for author_id in authors]
+
+
+def push_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator()
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя уже опубликованные посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date').iterator()
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def purge(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def follow(user_id, author_id):
+    count = change_follower_count(author_id, 1)
+    if count > settings.TIMELINE_PUSH_FOLLOWER_LIMIT and (
+        FollowerCount.objects.filter(
+            author_id=author_id, pulled=False
+        ).update(pulled=True)
+    ):
+        # Автор только что стал популярным: его посты теперь
+        # подтягиваются при чтении, а разложенные записи их дублируют.
+        TimelineEntry.objects.filter(author_id=author_id).delete()
+    elif not is_pulled(author_id):
+        backfill(user_id, author_id)
+
+
+def unfollow(user_id, author_id):
+    purge(user_id, author_id)
+    count = change_follower_count(author_id, -1)
+    if (
+        count is not None
+        and count <= settings.TIMELINE_REPUSH_FOLLOWER_LIMIT
+        and is_pulled(author_id)
+    ):
+        queue_repush(author_id)
+
+
+def repush(author_id):
+    """Возвращает автора на push и раскладывает его посты подписчикам.
+
+    Флаг снимается в той же транзакции, что и раскладка: читатели видят
+    либо старое состояние, либо уже разложенные записи. Повторная или
+    устаревшая задача ничего не делает.
+    """
+    with transaction.atomic():
+        if not FollowerCount.objects.filter(
+            author_id=author_id,
+            pulled=True,
+            count__lte=settings.TIMELINE_REPUSH_FOLLOWER_LIMIT,
+        ).update(pulled=False):
+            return
+        followers = Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+        for follower_id in followers.iterator():
+            backfill(follower_id, author_id)
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(settings.TIMELINE_WORKERS)
+    return _executor
+
+
+def run_repush(author_id):
+    try:
+        repush(author_id)
+    finally:
+        # Соединение открыто в потоке воркера и в нём же закрывается.
+        connection.close()
+
+
+def log_failure(future):
+    if future.exception() is not None:
+        logger.error('Timeline repush failed', exc_info=future.exception())
+
+
+def queue_repush(author_id):
+    """Ставит repush в очередь после коммита.
+
+    При TIMELINE_WORKERS = 0 раскладка идёт сразу после коммита.
+    """
+    def submit():
+        if not settings.TIMELINE_WORKERS:
+            repush(author_id)
+            return
+        executor().submit(run_repush, author_id).add_done_callback(
+            log_failure
+        )
+    transaction.on_commit(submit)
@@ -0,0 +1,178 @@
+"""Потоковая загрузка картинок постов.
+
+ImageUploadHandler пишет картинку на диск частями, по первым байтам
+проверяет формат и перестаёт писать, как только файл превысил лимит,
+поэтому в памяти не бывает больше одного блока загрузки. normalize()
+за один проход приводит картинку к POST_IMAGE_MAX_SIDE: JPEG сразу
+декодируется с уменьшением (draft), ориентация из EXIF применяется
+к пикселям, а сами метаданные не сохраняются. describe() считает
+размеры и крошечное превью, которые Post хранит, чтобы шаблоны
+не открывали файл.
+"""
+import base64
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import (
+    FileUploadHandler, StopFutureHandlers
+)
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+
+ORIENTATION = 0x0112
+
+# Значения ORIENTATION, при которых ширина и высота меняются местами.
+ROTATED = {5, 6, 7, 8}
+
+# Пропорции миниатюры 960x339: превью показывается на её месте.
+PREVIEW_SIZE = (28, 10)
+
+# Расширение имени файла по формату, который определил Pillow.
+EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+}
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True, 'progressive': True},
+}
+
+
+def sniff(header):
+    """Формат картинки по сигнатуре в начале файла или None."""
+    for signature, image_format in SIGNATURES:
+        if header.startswith(signature):
+            return image_format
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """Пишет поле image во временный файл с проверками по ходу загрузки.
+
+    Отклонённый файл не прерывает запрос: он приходит в форму пустым
+    и с причиной в upload_error, чтобы форма показала понятную ошибку.
+    """
+
+    field_name = 'image'
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.active = field_name == self.field_name
+        if not self.active:
+            return
+        self.file = TemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset,
+            self.content_type_extra,
+        )
+        self.file.upload_error = None
+        self.file.image_format = None
+        raise StopFutureHandlers()
+
+    def reject(self, error):
+        self.file.upload_error = error
+        self.file.seek(0)
+        self.file.truncate()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        if self.file.upload_error:
+            return None
+        if start == 0:
+            self.file.image_format = sniff(raw_data[:12])
+            if self.file.image_format is None:
+                self.reject('Загрузите картинку в формате JPEG, PNG, GIF '
+                            'или WebP.')
+                return None
+        if start + len(raw_data) > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+            limit = filesizeformat(settings.POST_IMAGE_MAX_UPLOAD_SIZE)
+            self.reject(f'Картинка больше {limit}.')
+            return None
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        self.file.size = self.file.tell()
+        self.file.seek(0)
+        return self.file
+
+
+def rename(upload, image_format):
+    """Меняет расширение в имени загрузки на расширение её формата."""
+    extension = EXTENSIONS.get(image_format, f'.{image_format.lower()}')
+    upload.name = os.path.splitext(upload.name)[0] + extension
+
+
+def normalize(upload):
+    """Картинка для хранения: не больше POST_IMAGE_MAX_SIDE, без EXIF.
+
+    Размеры читаются из заголовка до декодирования; анимированные GIF
+    сохраняются как есть. Результат пишется в тот же файл загрузки,
+    который Django закроет и удалит в конце запроса, а расширение
+    имени берётся из формата, а не из того, что прислал клиент.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if image.width * image.height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError('Слишком большое разрешение картинки.')
+        image_format = image.format
+        rename(upload, image_format)
+        if image_format == 'GIF':
+            upload.seek(0)
+            return upload
+        max_side = settings.POST_IMAGE_MAX_SIDE
+        if image_format == 'JPEG':
+            image.draft('RGB', (max_side, max_side))
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side))
+    image.info = {}
+    options = dict(SAVE_OPTIONS.get(image_format, {}))
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    upload.seek(0)
+    upload.truncate()
+    image.save(upload, image_format, **options)
+    upload.size = upload.tell()
+    upload.seek(0)
+    return upload
+
+
+def describe(file):
+    """Ширина, высота и превью картинки в виде data URI.
+
+    Превью — JPEG размером PREVIEW_SIZE с той же обрезкой по центру,
+    что у миниатюры; браузер растягивает его, и оно выглядит размытым.
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        # Размеры читаются до draft(), который уменьшает JPEG.
+        width, height = image.size
+        if image.getexif().get(ORIENTATION) in ROTATED:
+            width, height = height, width
+        image.draft('RGB', (PREVIEW_SIZE[0] * 4, PREVIEW_SIZE[1] * 4))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGBA').convert('RGB')
+        preview = ImageOps.fit(image, PREVIEW_SIZE, Image.BICUBIC)
+    file.seek(0)
+    buffer = io.BytesIO()
+    preview.save(buffer, 'JPEG', quality=40)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return width, height, f'data:image/jpeg;base64,{encoded}'
@@ -1,32 +1,53 @@
+import os
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import caches
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
-from django.core.paginator import Paginator
+from .models import (
+    LIST_DEFERRED_FIELDS, Post, Group, User, Follow, TimelineEntry
+)
 from .forms import PostForm, CommentForm
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from . import cache, search, thumbnails
+from .paginators import (
+    CursorPaginator, SearchPaginator, TimelinePaginator, cached_count
+)
+from .timeline import pulled_feeds
 
 POSTS_PER_PAGE = 10
 
 
-@cache_page(60 * 20)
+@cache.conditional_page(cache.index_scopes, cache.index_newest)
+@cache.cached_page(cache.index_scopes)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related(
+        'author', 'group'
+    ).defer(*LIST_DEFERRED_FIELDS)
+    paginator = CursorPaginator(
+        post_list, POSTS_PER_PAGE, scopes=cache.index_scopes(request)
+    )
+    page_obj = paginator.get_request_page(request)
+    thumbnails.attach(page_obj)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache.conditional_page(cache.group_scopes, cache.group_newest)
+@cache.cached_page(cache.group_scopes)
 def group_posts(request, slug):
-    group = get_object_or_404(
-        Group.objects.prefetch_related('posts'), slug=slug
+    group = get_object_or_404(Group, slug=slug)
+    paginator = CursorPaginator(
+        group.posts.select_related('author').defer(*LIST_DEFERRED_FIELDS),
+        POSTS_PER_PAGE,
+        scopes=cache.group_scopes(request, slug),
     )
-    paginator = Paginator(group.posts.all(), POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginator.get_request_page(request)
+    thumbnails.attach(page_obj)
     context = {
         'group': group,
         'page_obj': page_obj
@@ -34,32 +55,34 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cache.conditional_page(cache.profile_scopes, cache.profile_newest)
+@cache.cached_page(cache.profile_scopes)
 def profile(request, username):
     user = get_object_or_404(User, username=username)
-    posts = user.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = request.user.is_authenticated and \
-        Follow.objects.filter(
-            user=request.user,
-            author=user
-        ).exists()
+    posts = user.posts.select_related('group').defer(*LIST_DEFERRED_FIELDS)
+    scopes = cache.profile_scopes(request, username)
+    paginator = CursorPaginator(posts, POSTS_PER_PAGE, scopes=scopes)
+    page_obj = paginator.get_request_page(request)
+    thumbnails.attach(page_obj)
     context = {
         'page_obj': page_obj,
         'user': user,
         'posts': posts,
+        'posts_count': cached_count(posts, scopes=scopes),
         'author': user,
-        'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@cache.conditional_page(cache.detail_scopes, cache.detail_newest)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id
+    )
+    thumbnails.attach([post])
     post_count = Post.objects.filter(author=post.author).count()
     form = CommentForm()
-    comments = post.comments.all()
+    comments = post.comments.select_related('author')
     context = {
         'post': post,
         'post_count': post_count,
@@ -69,6 +92,30 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    expression = search.match_expression(query)
+    page_obj = None
+    if expression:
+        posts = Post.objects.select_related(
+            'author', 'group'
+        ).defer(*LIST_DEFERRED_FIELDS)
+        if search.supported():
+            paginator = SearchPaginator(posts, POSTS_PER_PAGE, expression)
+        else:
+            paginator = CursorPaginator(
+                posts.filter(text__icontains=query), POSTS_PER_PAGE
+            )
+        page_obj = paginator.get_request_page(request)
+        thumbnails.attach(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': f'{urlencode({"q": query})}&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None)
@@ -92,6 +139,8 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         post.save()
+        if 'image' in form.changed_data and post.image:
+            thumbnails.queue_on_commit(post)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -115,10 +164,16 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    entries = TimelineEntry.objects.filter(
+        user=request.user
+    ).select_related('post__author', 'post__group').defer(
+        *[f'post__{field}' for field in LIST_DEFERRED_FIELDS]
+    )
+    paginator = TimelinePaginator(
+        entries, POSTS_PER_PAGE, pulled=pulled_feeds(request.user)
+    )
+    page_obj = paginator.get_request_page(request)
+    thumbnails.attach(page_obj)
     context = {'page_obj': page_obj,
                'paginator': paginator}
     return render(request, 'posts/follow.html', context)
@@ -139,3 +194,20 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+@staff_member_required
+def cache_stats(request):
+    """Счётчики кэша страниц и кэшей процесса, ответившего на запрос.
+
+    Статистика LRUCache своя у каждого процесса, поэтому в ответе есть
+    его pid: разные воркеры показывают разные числа.
+    """
+    return JsonResponse({
+        'pid': os.getpid(),
+        'page_cache': cache.page_cache_stats(),
+        'caches': {
+            alias: caches[alias].stats() for alias in settings.CACHES
+            if hasattr(caches[alias], 'stats')
+        },
+    })
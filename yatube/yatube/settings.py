@@ -57,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.HoleMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -142,11 +143,81 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.ImageUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CACHES = {
+    'default': {
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    'local': {
+        'BACKEND': 'core.cache_backends.lru.LRUCache',
+        'LOCATION': 'local',
+        'OPTIONS': {
+            'MAX_BYTES': 64 * 1024 * 1024,
+            'COMPRESS_MIN_BYTES': 1024,
+        },
+    },
+}
+
+# Тесты очищают кэш: общий файл на диске им не отдаём. Эти кэши
+# подставляет TEST_RUNNER, а pytest берёт их из yatube.test_settings.
+TEST_CACHES = {
+    **CACHES,
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'LOCATION': 'tests',
+    },
 }
+
+TEST_RUNNER = 'core.runner.TestRunner'
+
+POSTS_PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+POSTS_PAGE_CACHE_STALE_TIMEOUT = 60 * 60
+
+POSTS_PAGE_CACHE_LOCK_TIMEOUT = 10
+
+POSTS_PAGE_CACHE_LOCK_WAIT = 2
+
+POSTS_PAGE_CACHE_METRICS_FLUSH = 30
+
+POSTS_CARD_CACHE = 'local'
+
+POSTS_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+PAGINATOR_COUNT_TIMEOUT = 60 * 5
+
+TIMELINE_BATCH_SIZE = 500
+
+TIMELINE_PUSH_FOLLOWER_LIMIT = 1000
+
+TIMELINE_REPUSH_FOLLOWER_LIMIT = 800
+
+TIMELINE_WORKERS = 1
+
+THUMBNAIL_WORKERS = 2
+
+THUMBNAIL_QUEUE_TIMEOUT = 60 * 10
+
+POST_IMAGE_WIDTHS = (320, 640, 960)
+
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+
+POST_IMAGE_MAX_PIXELS = 50_000_000
+
+POST_IMAGE_MAX_SIDE = 2560
+
+SEARCH_RANK_WINDOW = 1000
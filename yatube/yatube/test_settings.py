@@ -0,0 +1,5 @@
+"""Настройки для pytest: общие кэши заменены на TEST_CACHES."""
+from .settings import *  # noqa: F401,F403
+from .settings import TEST_CACHES
+
+CACHES = TEST_CACHES